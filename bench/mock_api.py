@@ -0,0 +1,281 @@
+import json
+import random
+import asyncio
+import argparse
+import hashlib
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import web
+
+# ------------------ Mock Upstreams ------------------ #
+# A local stand-in for api.brawlstars.com (/v1/...) and api.brawltools.net
+# (/bt/...) serving a synthetic club. Responses carry ETags and honour
+# If-None-Match like the real API, latency and an error rate are injectable,
+# and every request is counted per route so a run can report requests/cycle.
+#
+#   python -m bench.mock_api --members 100 --port 8765 --latency 0.05 --error-rate 0.01
+#
+# Control endpoints (never delayed, failed or counted):
+#   POST /_bench/advance   one "tick" of player activity (see MockWorld.advance)
+#   GET  /_bench/stats     request counters since start
+
+BRAWLER_COUNT = 98
+BATTLELOG_SIZE = 25
+GLOBAL_BOARD_SIZE = 200
+# Smallest valid PNG (1x1), stands in for rendered cards
+PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+def make_tag(n: int) -> str:
+    alphabet = "0289PYLQGRJCUV"
+    digits = ""
+    n += 14 ** 5   # fixed width
+    while n:
+        n, r = divmod(n, len(alphabet))
+        digits = alphabet[r] + digits
+    return "#" + digits
+
+def strip_tag(raw: str) -> str:
+    return "#" + raw.replace("%23", "").replace("#", "").upper()
+
+def battle_time(ts: datetime) -> str:
+    return ts.strftime("%Y%m%dT%H%M%S.000Z")
+
+class MockWorld:
+    """Deterministic synthetic players, a club and global rankings."""
+
+    def __init__(self, members: int, seed: int = 1, active_ratio: float = 0.2, churn: int = 1):
+        self.rng = random.Random(seed)
+        self.active_ratio = active_ratio
+        self.churn = churn
+        self.club_tag = "#BENCH"
+        self.clock = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        self.brawlers = [
+            {"id": 16000000 + i, "name": f"BRAWLER{i}", "starPowers": [{"id": 1}, {"id": 2}], "gadgets": [{"id": 1}, {"id": 2}]}
+            for i in range(BRAWLER_COUNT)
+        ]
+
+        self.players = {}   # tag -> profile (players who left stay fetchable)
+        self.battles = {}   # tag -> battlelog items, newest first
+        self.club = []      # member tags in club order
+        self._next_id = 0
+        for _ in range(members):
+            self.club.append(self._new_player())
+
+    # ----------------- Generation ----------------- #
+
+    def _new_player(self) -> str:
+        tag = make_tag(self._next_id)
+        self._next_id += 1
+        rng = self.rng
+        brawlers = []
+        for b in self.brawlers[:rng.randint(BRAWLER_COUNT // 2, BRAWLER_COUNT)]:
+            trophies = rng.randint(0, 1100)
+            brawlers.append({
+                "id": b["id"],
+                "name": b["name"],
+                "power": rng.randint(1, 11),
+                "rank": 1,
+                "trophies": trophies,
+                "highestTrophies": trophies,
+                "highestSeasonTrophies": trophies,
+                "gears": [{"id": 1}] * rng.randint(0, 3),
+                "starPowers": [{"id": 1}] * rng.randint(0, 2),
+                "gadgets": [{"id": 1}] * rng.randint(0, 2),
+            })
+        self.players[tag] = {
+            "tag": tag,
+            "name": f"Player{self._next_id}",
+            "icon": {"id": 28000000 + rng.randint(0, 50)},
+            "trophies": sum(b["trophies"] for b in brawlers),
+            "brawlers": brawlers,
+        }
+        self.battles[tag] = [self._battle(tag, self.clock - timedelta(minutes=15 * i)) for i in range(BATTLELOG_SIZE)]
+        return tag
+
+    def _battle(self, tag: str, when: datetime) -> dict:
+        rng = self.rng
+        player = {
+            "tag": tag,
+            "name": self.players[tag]["name"],
+            "brawler": {"id": self.brawlers[0]["id"], "trophies": rng.randint(1, 22)},
+        }
+        others = [{"tag": f"#X{rng.randint(0, 1 << 20):X}", "brawler": {"trophies": 1}} for _ in range(5)]
+        battle_type = "soloRanked" if rng.random() < 0.3 else "ranked"
+        return {
+            "battleTime": battle_time(when),
+            "event": {"mode": "gemGrab"},
+            "battle": {"mode": "gemGrab", "type": battle_type, "teams": [[player] + others[:2], others[2:]]},
+        }
+
+    def advance(self) -> dict:
+        """
+        Moves the clock by three minutes. `active_ratio` of the club plays one
+        battle (new battlelog entry, +8 trophies on a random brawler) and
+        `churn` members leave while the same number of new players join.
+        """
+        self.clock += timedelta(minutes=3)
+        active = self.rng.sample(self.club, int(len(self.club) * self.active_ratio))
+        for tag in active:
+            profile = self.players[tag]
+            if profile["brawlers"]:
+                b = self.rng.choice(profile["brawlers"])
+                b["trophies"] += 8
+                b["highestTrophies"] = max(b["highestTrophies"], b["trophies"])
+                b["highestSeasonTrophies"] = max(b["highestSeasonTrophies"], b["trophies"])
+                profile["trophies"] += 8
+            log = self.battles[tag]
+            log.insert(0, self._battle(tag, self.clock))
+            del log[BATTLELOG_SIZE:]
+
+        for _ in range(min(self.churn, len(self.club))):
+            self.club.pop(self.rng.randrange(len(self.club)))
+            self.club.append(self._new_player())
+        return {"active": len(active), "churn": self.churn, "clock": battle_time(self.clock)}
+
+    # ----------------- Payloads ----------------- #
+
+    def club_members(self) -> dict:
+        items = []
+        for i, tag in enumerate(self.club):
+            p = self.players[tag]
+            items.append({
+                "tag": tag,
+                "name": p["name"],
+                "role": "president" if i == 0 else "member",
+                "trophies": p["trophies"],
+                "icon": p["icon"],
+            })
+        return {"items": items}
+
+    def brawltools_player(self, tag: str) -> dict:
+        p = self.players[tag]
+        return {"data": {
+            **p,
+            "favouriteBrawler": p["brawlers"][0]["id"] if p["brawlers"] else 16000000,
+            "famePoints": 0,
+            "soloVictories": 10,
+            "duoVictories": 10,
+            "3vs3Victories": 100,
+            "rankedPoints": 1000,
+            "ranked": 5,
+            "highestRankedPoints": 1200,
+            "highestRanked": 6,
+            "playedHours": 100,
+            "prestige": 0,
+            "recordRank": 1,
+            "recordPoints": 0,
+        }}
+
+    def global_players(self) -> dict:
+        return {"items": [{"tag": make_tag(10 ** 6 + i), "trophies": 150000 - i * 100} for i in range(GLOBAL_BOARD_SIZE)]}
+
+    def brawler_ranking(self, brawler_id: int, limit: int) -> dict:
+        base = 2000 + brawler_id % 100
+        return {"items": [{"tag": make_tag(10 ** 6 + i), "trophies": base - i} for i in range(limit)]}
+
+# ------------------ HTTP App ------------------ #
+
+def make_app(world: MockWorld, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: int = 1):
+    rng = random.Random(seed)
+    counts = Counter()
+
+    @web.middleware
+    async def upstream(request, handler):
+        if request.path.startswith("/_bench/"):
+            return await handler(request)
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else "unmatched"
+        counts[route] += 1
+        if latency or jitter:
+            await asyncio.sleep(latency + rng.uniform(0, jitter))
+        if error_rate and rng.random() < error_rate:
+            counts["injected_errors"] += 1
+            return web.json_response({"reason": "injected"}, status=503)
+        return await handler(request)
+
+    def respond(request, payload):
+        body = json.dumps(payload).encode()
+        etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            counts["not_modified"] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(body=body, content_type="application/json", headers={"ETag": etag})
+
+    def player_or_404(request):
+        tag = strip_tag(request.match_info["tag"])
+        if tag not in world.players:
+            raise web.HTTPNotFound(text=json.dumps({"reason": "notFound"}), content_type="application/json")
+        return tag
+
+    async def club_members(request):
+        return respond(request, world.club_members())
+
+    async def player(request):
+        return respond(request, world.players[player_or_404(request)])
+
+    async def battlelog(request):
+        return respond(request, {"items": world.battles[player_or_404(request)]})
+
+    async def global_players(request):
+        return respond(request, world.global_players())
+
+    async def brawlers(request):
+        return respond(request, {"items": world.brawlers})
+
+    async def brawler_ranking(request):
+        limit = int(request.query.get("limit", GLOBAL_BOARD_SIZE))
+        return respond(request, world.brawler_ranking(int(request.match_info["id"]), limit))
+
+    async def bt_player(request):
+        return web.json_response(world.brawltools_player(player_or_404(request)))
+
+    async def bt_club(request):
+        members = [{"tag": m["tag"], "name": m["name"], "role": m["role"], "trophies": m["trophies"]}
+                   for m in world.club_members()["items"]]
+        return web.json_response({"data": {"tag": world.club_tag, "members": members}})
+
+    async def image(request):
+        return web.Response(body=PNG, content_type="image/png")
+
+    async def advance(request):
+        return web.json_response(world.advance())
+
+    async def stats(request):
+        return web.json_response(dict(counts))
+
+    app = web.Application(middlewares=[upstream])
+    app.router.add_get("/v1/clubs/{tag}/members", club_members)
+    app.router.add_get("/v1/players/{tag}", player)
+    app.router.add_get("/v1/players/{tag}/battlelog", battlelog)
+    app.router.add_get("/v1/rankings/global/players", global_players)
+    app.router.add_get("/v1/rankings/global/brawlers/{id}", brawler_ranking)
+    app.router.add_get("/v1/brawlers", brawlers)
+    app.router.add_get("/bt/players/{tag}", bt_player)
+    app.router.add_get("/bt/players/{tag}/image", image)
+    app.router.add_get("/bt/clubs/{tag}", bt_club)
+    app.router.add_get("/bt/clubs/{tag}/image", image)
+    app.router.add_post("/_bench/advance", advance)
+    app.router.add_get("/_bench/stats", stats)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a mock Brawl Stars + brawltools API")
+    parser.add_argument("--members", type=int, default=30)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every upstream request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform random delay, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered 503")
+    parser.add_argument("--active-ratio", type=float, default=0.2)
+    parser.add_argument("--churn", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    world = MockWorld(args.members, seed=args.seed, active_ratio=args.active_ratio, churn=args.churn)
+    app = make_app(world, args.latency, args.jitter, args.error_rate, args.seed)
+    web.run_app(app, host="127.0.0.1", port=args.port, access_log=None, print=None)
+
+if __name__ == "__main__":
+    main()
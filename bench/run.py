@@ -0,0 +1,306 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import resource
+import statistics
+import subprocess
+import tempfile
+import urllib.request
+from datetime import datetime, timezone
+
+# ------------------ Poll Cycle Benchmark ------------------ #
+# Runs the real tracking code (milestones.poll_members, bot.check_club_changes
+# and bot.fetch_global_leaderboard) against bench/mock_api.py for synthetic
+# clubs of several sizes and reports cycle time, upstream requests per cycle
+# and peak memory. Every size runs in a fresh worker process with its own
+# data.json, state.db and history.db in a temp directory, so nothing touches
+# the real bot state.
+#
+#   python -m bench.run                          # 30, 100 and 1000 members
+#   python -m bench.run --sizes 100 --latency 0.05 --error-rate 0.02
+#   python -m bench.run --compare latest         # diff against the last saved run
+#
+# Results are saved to bench/results/<timestamp>.json.
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO, "bench", "results")
+
+# Summary keys shown in the report and compared between runs (lower is better)
+REPORT_KEYS = (
+    "cold_cycle_seconds",
+    "cycle_seconds_p50",
+    "cycle_seconds_max",
+    "requests_per_cycle",
+    "sends_per_cycle",
+    "leaderboard_seconds",
+    "leaderboard_requests",
+    "peak_rss_mb",
+)
+
+# ------------------ Worker ------------------ #
+
+class FakeChannel:
+    """Stands in for a discord.TextChannel; counts sends, optionally slow."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.sends = 0
+
+    async def send(self, *args, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sends += 1
+
+def _control(port: int, path: str, method: str = "GET") -> dict:
+    req = urllib.request.Request(f"http://127.0.0.1:{port}/_bench/{path}", method=method)
+    with urllib.request.urlopen(req, timeout=10) as resp:
+        return json.load(resp)
+
+def _upstream_requests(stats: dict) -> int:
+    return sum(v for k, v in stats.items() if k.startswith("/"))
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+async def run_worker(args) -> dict:
+    """Runs inside the temp directory; imports the bot against the mock API."""
+    import helpers
+    import milestones
+    import bot
+    from clubs import CLUBS, flush_all
+    from history import history
+    from discord_client import client
+
+    channel = FakeChannel(args.discord_latency)
+    client.get_channel = lambda _id: channel
+
+    # Control calls are blocking on purpose: they run between timed sections
+    club = CLUBS[0]
+    data2 = milestones.load_data2(club)
+    applied = {}
+    cycles = []
+    for _ in range(args.cycles):
+        _control(args.port, "advance", "POST")
+        before = _control(args.port, "stats")
+        sends_before = channel.sends
+
+        start = time.perf_counter()
+        members = await helpers.get_club_members(club.tag)
+        global_best = await milestones.get_global_trophy_leader()
+        # Every member is due each cycle: the worst case the scheduler can produce
+        await milestones.poll_members(club, members, members, data2, global_best, applied)
+        await bot.check_club_changes(club, channel)
+        elapsed = time.perf_counter() - start
+
+        after = _control(args.port, "stats")
+        cycles.append({
+            "seconds": elapsed,
+            "members": len(members),
+            "requests": _upstream_requests(after) - _upstream_requests(before),
+            "not_modified": after.get("not_modified", 0) - before.get("not_modified", 0),
+            "injected_errors": after.get("injected_errors", 0) - before.get("injected_errors", 0),
+            "sends": channel.sends - sends_before,
+        })
+
+    before = _control(args.port, "stats")
+    start = time.perf_counter()
+    board = await bot.fetch_global_leaderboard()
+    leaderboard_seconds = time.perf_counter() - start
+    leaderboard_requests = _upstream_requests(_control(args.port, "stats")) - _upstream_requests(before)
+
+    start = time.perf_counter()
+    await flush_all()
+    await history.flush()
+    flush_seconds = time.perf_counter() - start
+    await helpers.close_session()
+
+    return {
+        "cycles": cycles,
+        "leaderboard_seconds": leaderboard_seconds,
+        "leaderboard_requests": leaderboard_requests,
+        "leaderboard_rows": len(board[0]) if board else 0,
+        "flush_seconds": flush_seconds,
+        "peak_rss_mb": _peak_rss_mb(),
+        "upstream": _control(args.port, "stats"),
+    }
+
+# ------------------ Orchestration ------------------ #
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_ready(port: int, proc, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("mock API exited during startup")
+        try:
+            return _control(port, "stats")
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("mock API did not start")
+
+def bench_config(port: int, args) -> dict:
+    """data.json for the worker: the real defaults except for upstream URLs and pacing."""
+    return {
+        "token": "bench",
+        "BrawlStarsAPITOKEN": "bench",
+        "Club": "#BENCH",
+        "ClubStatChannel": "1",
+        "UpdateTime": "180",
+        "BRAWL_API_BASE_URL": f"http://127.0.0.1:{port}/v1/",
+        "BRAWLTOOLS_BASE_URL": f"http://127.0.0.1:{port}/bt/",
+        "API_RATE_PER_SEC": args.api_rate,
+        "API_BURST": max(1, int(args.api_rate)),
+        # Cycles run back to back but stand for POLL_SECONDS of real time, by
+        # which point these caches would have expired
+        "CLUB_CACHE_TTL": 0,
+        "PROFILE_CACHE_TTL": 0,
+        "PROFILE_CACHE_STALE": 0,
+        "METRICS_PORT": 0,
+    }
+
+def summarize(members: int, raw: dict) -> dict:
+    cycles = raw["cycles"]
+    warm = cycles[1:] or cycles
+    return {
+        "members": members,
+        "cold_cycle_seconds": cycles[0]["seconds"],
+        "cycle_seconds_p50": statistics.median(c["seconds"] for c in warm),
+        "cycle_seconds_max": max(c["seconds"] for c in warm),
+        "requests_per_cycle": statistics.mean(c["requests"] for c in warm),
+        "not_modified_per_cycle": statistics.mean(c["not_modified"] for c in warm),
+        "sends_per_cycle": statistics.mean(c["sends"] for c in warm),
+        "leaderboard_seconds": raw["leaderboard_seconds"],
+        "leaderboard_requests": raw["leaderboard_requests"],
+        "flush_seconds": raw["flush_seconds"],
+        "peak_rss_mb": raw["peak_rss_mb"],
+        "cycles": cycles,
+        "upstream": raw["upstream"],
+    }
+
+def run_size(members: int, args) -> dict:
+    port = _free_port()
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "bench.mock_api", "--members", str(members), "--port", str(port),
+         "--latency", str(args.latency), "--jitter", str(args.jitter),
+         "--error-rate", str(args.error_rate), "--seed", str(args.seed)],
+        cwd=REPO,
+    )
+    try:
+        _wait_ready(port, mock)
+        with tempfile.TemporaryDirectory(prefix="fff-bench-") as tmp:
+            with open(os.path.join(tmp, "data.json"), "w") as f:
+                json.dump(bench_config(port, args), f)
+            output = os.path.join(tmp, "result.json")
+            proc = subprocess.run(
+                [sys.executable, "-m", "bench.run", "--worker", "--port", str(port), "--output", output,
+                 "--cycles", str(args.cycles), "--discord-latency", str(args.discord_latency)],
+                cwd=tmp,
+                env={**os.environ, "PYTHONPATH": REPO},
+                stdout=None if args.verbose else subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+            if proc.returncode != 0:
+                raise RuntimeError(f"worker for {members} members failed:\n{proc.stderr[-4000:]}")
+            with open(output) as f:
+                return summarize(members, json.load(f))
+    finally:
+        mock.terminate()
+        mock.wait()
+
+# ------------------ Reporting ------------------ #
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+def save_results(results: dict) -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, results["created"].replace(":", "") + ".json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    return path
+
+def load_previous(spec: str, exclude: str = None) -> dict:
+    """`spec` is a results file or "latest" (newest saved run other than `exclude`)."""
+    if spec != "latest":
+        with open(spec) as f:
+            return json.load(f)
+    paths = sorted(
+        os.path.join(RESULTS_DIR, name) for name in os.listdir(RESULTS_DIR) if name.endswith(".json")
+    ) if os.path.isdir(RESULTS_DIR) else []
+    paths = [p for p in paths if p != exclude]
+    if not paths:
+        return None
+    with open(paths[-1]) as f:
+        return json.load(f)
+
+def print_report(results: dict, previous: dict = None):
+    print(f"\nCommit {results['commit'] or '?'} — {results['params']}")
+    for size, summary in results["runs"].items():
+        old = (previous or {}).get("runs", {}).get(size)
+        print(f"\n{size} members")
+        for key in REPORT_KEYS:
+            line = f"  {key:<24}{summary[key]:>12.3f}"
+            if old and old.get(key):
+                delta = (summary[key] - old[key]) / old[key] * 100
+                line += f"   was {old[key]:>10.3f} ({delta:+.1f}%)"
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the poll cycle against a local mock API")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[30, 100, 1000])
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02, help="mock upstream latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--discord-latency", type=float, default=0.0)
+    parser.add_argument("--api-rate", type=float, default=1000,
+                        help="API_RATE_PER_SEC for the run (production default is 10)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--compare", help='results file to compare with, or "latest"')
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="show the bot's own output")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = asyncio.run(run_worker(args))
+        with open(args.output, "w") as f:
+            json.dump(result, f)
+        return
+
+    results = {
+        "created": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "commit": _git_commit(),
+        "params": {k: getattr(args, k) for k in
+                   ("cycles", "latency", "jitter", "error_rate", "discord_latency", "api_rate", "seed")},
+        "runs": {},
+    }
+    for size in args.sizes:
+        print(f"⏱️ Benchmarking {size} members...")
+        results["runs"][str(size)] = run_size(size, args)
+
+    path = None if args.no_save else save_results(results)
+    previous = load_previous(args.compare, exclude=path) if args.compare else None
+    print_report(results, previous)
+    if path:
+        print(f"\n💾 Saved {os.path.relpath(path, REPO)}")
+
+if __name__ == "__main__":
+    main()
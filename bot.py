@@ -1,256 +1,225 @@
+# Imported first so the start-up timing covers every other import
+import startup
+# Loads and validates data.json before anything heavy is imported
+from config import config
 import discord
 from discord import app_commands
-import json
 import asyncio
-import aiohttp
-import os
+import io
 import math
+import time
 from datetime import datetime, timedelta, timezone
-import aiohttp
-import asyncio
-import requests
 from datetime import date
-# NOTE: Assumed 'info.py' contains required variables like Boxes, Ranks, Brawlers, etc.
-# These variables are crucial for the create_profile_embed function.
-from info import Boxes, Ranks, brawlers_with_emojiid, records, Brawlers, upgrade_costs, COINS_PER_STARPOWER, COINS_PER_GADGET, fame 
+# Static tables from info.py; ranks, boxes and the brawler roster are looked up through catalog.py
+from info import records, fame
+from catalog import catalog
+from costs import cost_to_max, club_cost_to_max
+from cache import TTLCache, json_size
+import clubdiff
 # Import the tracking bot module
 import milestones
-# ----------------------------
-# Load / Save JSON
-# ----------------------------
-def load_data():
-    """Loads the bot configuration and cache data from data.json."""
-    try:
-        with open("data.json", "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print("data.json not found. Creating a default structure.")
-        # Return a base structure if the file is missing to prevent crash on startup
-        return {
-            "token": "",
-            "ClubStatChannel": "0",
-            "Club": "",
-            "UpdateTime": "180",
-            "DailyUpdate": str(date.today()),
-            "club_cache": {}
-        }
-    except json.JSONDecodeError:
-        print("Error decoding data.json. Check file content.")
-        return {}
-
-def save_data(data):
-    """Saves the bot configuration and cache data to data.json."""
-    with open("data.json", "w") as f:
-        json.dump(data, f, indent=4)
-
-data = load_data()
+import helpers
+import brawltools
+from store import state
+from clubs import CLUBS, find_club, flush_all
+from history import history, TOTAL, RANKED
+import metrics
+from metrics import discord_send
+from discord_client import client, tree
+from jobs import jobs
+
+startup.mark("imports")
 
 # ----------------------------
 # Config
 # ----------------------------
-TOKEN = data["token"]
-CLUBSTATS_CHANNEL_ID = int(data["ClubStatChannel"])
+TOKEN = config["token"]
+# Tracked clubs and their channels (stats, join/leave, tracking) come from
+# clubs.py: the "Clubs" list in data.json, or the single "Club" setup.
+UPDATE_TIME = int(config.get("UpdateTime", 180))
+# Prometheus text endpoint on 127.0.0.1 (0 disables it)
+METRICS_PORT = int(config.get("METRICS_PORT", 9108))
 
-# NEW CHANNEL ID FOR JOIN/LEAVE NOTIFICATIONS (Replace with your actual ID)
-# NOTE: The provided ID '1434373001285210124' is used as an example, ensure it's correct.
-JOIN_LEAVE_CHANNEL_ID = 1434373001285210124 
-CLUB_TAG = data["Club"].replace("#", "").upper()
-UPDATE_TIME = int(data.get("UpdateTime", 180))
-
-# API URLs
-ClubImageAPI = f"https://api.brawltools.net/clubs/{CLUB_TAG}/image?option=2&quality=high"
-PlayerImageAPI = "https://api.brawltools.net/players/{tag}/image?option=8&quality=high"
-PlayerAPI = "https://api.brawltools.net/players/"
-ClubAPI = f"https://api.brawltools.net/clubs/{CLUB_TAG}"
-
-# ----------------------------
-# Discord client
-# ----------------------------
-intents = discord.Intents.default()
-# Intents are required for member-related events, which is critical for club tracking
-intents.members = True 
-client = discord.Client(intents=intents)
-tree = app_commands.CommandTree(client)
-
-# --- Configuration Loading ---
-# Load data.json to get the API Token
-config_data = load_data()
-BRAWL_API_TOKEN = config_data.get("BrawlStarsAPITOKEN")
 GLOBAL_LEADERBOARD_CHANNEL_ID = 1435006603882659860
-if not BRAWL_API_TOKEN:
-    print("⚠️ 'BrawlStarsAPITOKEN' not found in data.json. Global summary will fail.")
+# Runs a day may wait for missing boards before posting what it has
+GLOBAL_LEADERBOARD_ATTEMPTS = int(config.get("GLOBAL_LEADERBOARD_ATTEMPTS", 3))
 
 # --- GLOBAL LEADERBOARD SUMMARY --- #
 
-async def post_global_leaderboard_summary(client):
+# Day -> runs so far that came back with missing boards
+global_leaderboard_attempts = {}
+
+async def fetch_global_leaderboard():
     """
-    Fetches the lowest trophy amount for every Brawler 
-    and posts a summary in a single unified style.
+    Returns ([(BRAWLER NAME, lowest trophies on its global board)], [names
+    of brawlers whose board could not be fetched]), or None if the brawler
+    catalog could not be loaded.
     """
-    await client.wait_until_ready()
-    print("🌍 Global leaderboard tracker started.")
+    job_start = time.perf_counter()
 
-    token = data.get("BrawlStarsAPITOKEN")
-    if not token:
-        print("⚠️ 'BrawlStarsAPITOKEN' not found in data.json.")
-        return
+    await catalog.refresh()
+    api_brawlers = catalog.brawlers
+    if not api_brawlers:
+        return None
+
+    # All brawlers in parallel, paced by the shared API rate limiter
+    rankings = await helpers.gather_limited(api_brawlers, lambda b: helpers.get_brawler_ranking(b.get("id")))
 
-    headers = {"Authorization": f"Bearer {token}"}
-    brawler_emoji_map = {b["name"]: f"<:b:{b['emojiid']}>" for b in brawlers_with_emojiid}
+    # Boards that failed (retry budget spent, 429s) get one more pass once the burst is over
+    failed = [i for i, players in enumerate(rankings) if players is None]
+    if failed:
+        retried = await helpers.gather_limited(
+            [api_brawlers[i] for i in failed], lambda b: helpers.get_brawler_ranking(b.get("id"))
+        )
+        for i, players in zip(failed, retried):
+            rankings[i] = players
+
+    leaderboard_data = []
+    missing = []
+    for b, players in zip(api_brawlers, rankings):
+        name = b.get("name", "").upper()
+        if players is None:
+            missing.append(name)
+        elif players:
+            trophies = players[-1].get("trophies", 0)
+            leaderboard_data.append((name, trophies))
+
+    metrics.observe("poll_cycle_seconds", time.perf_counter() - job_start, job="global_leaderboard")
+    return leaderboard_data, missing
+
+async def post_global_leaderboard_summary():
+    """
+    Fetches the lowest trophy amount for every Brawler 
+    and posts a summary in a single unified style (once a day).
+    """
+    EST = timezone(timedelta(hours=-5))
+    now = datetime.now(EST)
+    today_str = now.strftime("%Y-%m-%d")
 
-    while not client.is_closed():
-        EST = timezone(timedelta(hours=-5))
-        now = datetime.now(EST)
-        today_str = now.strftime("%Y-%m-%d")
+    if state.get_flag("GlobalSentToday") == today_str:
+        return
 
-        if data.get("GlobalSentToday", {}).get("date") == today_str:
-            await asyncio.sleep(600)
-            continue
+    print(f"🌍 Starting daily global fetch...")
+    result = await fetch_global_leaderboard()
+    if result is None:
+        return
+    leaderboard_data, missing = result
+
+    # Missing boards are usually transient: wait for a later run, but only a
+    # few times a day, so one board that never answers cannot block the post
+    if missing:
+        attempts = global_leaderboard_attempts.get(today_str, 0) + 1
+        global_leaderboard_attempts.clear()
+        global_leaderboard_attempts[today_str] = attempts
+        if attempts < GLOBAL_LEADERBOARD_ATTEMPTS:
+            print(f"⚠️ Global leaderboard incomplete ({len(missing)} brawlers missing), will retry later")
+            return
+        print(f"⚠️ Posting global leaderboard without {len(missing)} brawlers: {', '.join(missing)}")
+
+    if leaderboard_data:
+        leaderboard_data.sort(key=lambda x: x[1], reverse=True)
+
+        # Reverting to your original formatting style
+        formatted_lines = []
+        for idx, (name, trophies) in enumerate(leaderboard_data, start=1):
+            emoji_id = catalog.emoji(name)
+            emoji = f"<:b:{emoji_id}>" if emoji_id else ""
+            # Using the trophy emoji from your original script
+            formatted_lines.append(f"{idx}. {emoji} {name} — <:tr:1449145784313581764>{trophies}")
+
+        channel = client.get_channel(GLOBAL_LEADERBOARD_CHANNEL_ID)
+        if channel:
+            # Joining lines back into a single block
+            full_text = "\n".join(formatted_lines)
+            
+            # Using your original 3900 character limit chunking
+            # This keeps the sections much larger (usually only 2 blocks)
+            def chunk_text(text, limit=3900):
+                chunks = []
+                current = ""
+                for line in text.splitlines():
+                    if len(current) + len(line) + 1 > limit:
+                        chunks.append(current)
+                        current = line
+                    else:
+                        current += ("\n" if current else "") + line
+                if current: chunks.append(current)
+                return chunks
+
+            chunks = chunk_text(full_text)
+            day = now.strftime("%B %d, %Y")
+
+            for i, chunk in enumerate(chunks):
+                embed = discord.Embed(
+                    # Restoring the original Blue color and Title
+                    title=f"🌍 Global Leaderboard Trophies Lows — {day}" if i == 0 else "",
+                    description=chunk,
+                    color=discord.Color.blue(),
+                    timestamp=datetime.now(timezone.utc)
+                )
+                if missing and i == len(chunks) - 1:
+                    embed.set_footer(text=f"⚠️ No board for: {', '.join(missing)}"[:2048])
+
+                await discord_send(channel, embed=embed)
+            
+            state.set_flag("GlobalSentToday", today_str)
 
-        print(f"🌍 Starting daily global fetch...")
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get("https://api.brawlstars.com/v1/brawlers", headers=headers) as resp:
-                if resp.status != 200:
-                    await asyncio.sleep(600)
-                    continue
-                api_brawlers = (await resp.json()).get("items", [])
-
-            leaderboard_data = []
-            for b in api_brawlers:
-                bid = b.get("id")
-                name = b.get("name", "").upper()
-                url = f"https://api.brawlstars.com/v1/rankings/global/brawlers/{bid}"
-                try:
-                    async with session.get(url, headers=headers) as r:
-                        if r.status == 200:
-                            players = (await r.json()).get("items", [])
-                            if players:
-                                trophies = players[-1].get("trophies", 0)
-                                leaderboard_data.append((name, trophies))
-                except:
-                    continue
-                await asyncio.sleep(0.05)
-
-        if leaderboard_data:
-            leaderboard_data.sort(key=lambda x: x[1], reverse=True)
-
-            # Reverting to your original formatting style
-            formatted_lines = []
-            for idx, (name, trophies) in enumerate(leaderboard_data, start=1):
-                emoji = brawler_emoji_map.get(name, "")
-                # Using the trophy emoji from your original script
-                formatted_lines.append(f"{idx}. {emoji} {name} — <:tr:1449145784313581764>{trophies}")
-
-            channel = client.get_channel(GLOBAL_LEADERBOARD_CHANNEL_ID)
-            if channel:
-                # Joining lines back into a single block
-                full_text = "\n".join(formatted_lines)
-                
-                # Using your original 3900 character limit chunking
-                # This keeps the sections much larger (usually only 2 blocks)
-                def chunk_text(text, limit=3900):
-                    chunks = []
-                    current = ""
-                    for line in text.splitlines():
-                        if len(current) + len(line) + 1 > limit:
-                            chunks.append(current)
-                            current = line
-                        else:
-                            current += ("\n" if current else "") + line
-                    if current: chunks.append(current)
-                    return chunks
-
-                chunks = chunk_text(full_text)
-                day = now.strftime("%B %d, %Y")
-
-                for i, chunk in enumerate(chunks):
-                    embed = discord.Embed(
-                        # Restoring the original Blue color and Title
-                        title=f"🌍 Global Leaderboard Trophies Lows — {day}" if i == 0 else "",
-                        description=chunk,
-                        color=discord.Color.blue(),
-                        timestamp=datetime.now(timezone.utc)
-                    )
-                    
-                    await channel.send(embed=embed)
-                
-                data["GlobalSentToday"] = {"date": today_str}
-                save_data(data)
-
-        await asyncio.sleep(600)
+# ----------------------------
+# Club channels
+# ----------------------------
+_missing_channels = set()
+
+def club_channels(attr: str, label: str) -> list:
+    """[(club, channel)] for every club whose `attr` channel the bot can see; warns once per missing one."""
+    targets = []
+    for club in CLUBS:
+        channel = client.get_channel(getattr(club, attr))
+        if channel is not None:
+            targets.append((club, channel))
+        elif (club.key, attr) not in _missing_channels:
+            _missing_channels.add((club.key, attr))
+            print(f"Channel not found or bot has no access ({label} of {club.name})")
+    return targets
 
 # ----------------------------
 # Player data fetch
 # ----------------------------
-def get_playerdata(tag):
+async def get_playerdata(tag):
     """Fetches full player profile data from the API."""
-    tag = tag.replace("#", "").upper()
-    url = PlayerAPI + tag
     try:
-        resp = requests.get(url)
-        if resp.status_code != 200:
-            return None
-        return resp.json()
-    except Exception as e:
+        return await brawltools.get_player(tag)
+    except brawltools.NotFound:
+        return None
+    except brawltools.BrawlToolsError as e:
         print(f"Error fetching player data for {tag}: {e}")
         return None
 
 # ----------------------------
 # Daily club image task
 # ----------------------------
-async def send_club_image_task():
-    """Periodically sends a club image update to the designated channel."""
-    await client.wait_until_ready()
-    channel = client.get_channel(CLUBSTATS_CHANNEL_ID)
-    if channel is None:
-        print("Channel not found or bot has no access (CLUBSTATS_CHANNEL_ID)")
+async def send_club_image(club, channel, today_str):
+    """Posts the club card once per day (the flag lives in the club's own state)."""
+    if club.state.get_flag("DailyUpdate") == today_str:
         return
+    club.state.set_flag("DailyUpdate", today_str)
 
-    async with aiohttp.ClientSession() as session:
-        while not client.is_closed():
-            today_str = str(date.today())
-            if data.get("DailyUpdate") != today_str:
-                data["DailyUpdate"] = today_str
-                save_data(data)
-
-                try:
-                    async with session.get(ClubImageAPI) as resp:
-                        if resp.status != 200:
-                            print(f"Failed to download image: {resp.status}")
-                            await asyncio.sleep(UPDATE_TIME)
-                            continue
-                        image_data = await resp.read()
-
-                    filename = "club_image.png"
-                    with open(filename, "wb") as f:
-                        f.write(image_data)
-
-                    await channel.send(file=discord.File(filename))
-                    os.remove(filename)
-                except Exception as e:
-                    print("Error sending club image:", e)
+    try:
+        image_data = await brawltools.get_club_image(club.tag)
+        await discord_send(channel, file=discord.File(io.BytesIO(image_data), filename=f"club_image_{club.key}.png"))
+    except brawltools.BrawlToolsError as e:
+        print(f"Failed to download image for {club.name}: {e}")
+    except Exception as e:
+        print(f"Error sending club image for {club.name}:", e)
 
-            await asyncio.sleep(UPDATE_TIME)
+async def send_club_images():
+    """Sends the club image to each club's stats channel (once a day per club)."""
+    today_str = str(date.today())
+    targets = club_channels("stats_channel_id", "ClubStatChannel")
+    await asyncio.gather(*(send_club_image(club, channel, today_str) for club, channel in targets))
 
 # ----------------------------
 # Helpers
 # ----------------------------
-def get_player_box(amount):
-    """Determines the trophy road box based on season trophies."""
-    best_box = None
-    for box in Boxes:
-        if amount >= box["amount"]:
-            best_box = box
-    return best_box
-
-def get_rank_by_id(rank_id):
-    """Retrieves rank details based on rank ID."""
-    for rank in Ranks:
-        if rank["id"] == rank_id:
-            return rank
-    return None
-
 def get_fame_tier(famepoints):
     """Calculates and formats the player's fame tier."""
     if famepoints == 0:
@@ -271,58 +240,37 @@ def get_fame_tier(famepoints):
     last_tier = fame[-1]
     return f"{last_tier['emojiid']} {last_tier['name']} III"
 
-def calculate_costs(owned_brawlers):
-    """Calculates the total coins and power points needed to max all 97 brawlers."""
-    total_coins_needed = 0
-    total_pp_needed = 0
-    
-    # Tracking progress for the embed
-    total_starpowers_owned = 0
-    total_gadgets_owned = 0
-    owned_count = len(owned_brawlers)
-    
-    # 1. Calculate costs for brawlers the player HAS unlocked
-    for b in owned_brawlers:
-        current_power = b["power"]
-        
-        # Power Level Costs: Check every upgrade step
-        for upgrade in upgrade_costs:
-            # If current power is 1, it needs the upgrade where "from" is 1
-            if current_power <= upgrade["from"]:
-                total_coins_needed += upgrade["coins"]
-                total_pp_needed += upgrade["power_points"]
-        
-        total_starpowers_owned += len(b.get("starPowers", []))
-        total_gadgets_owned += len(b.get("gadgets", []))
 
-    # 2. Calculate costs for brawlers NOT YET unlocked
-    # These are assumed to be Level 1 with nothing.
-    unowned_count = Brawlers - owned_count
-    
-    if unowned_count > 0:
-        # Sum of a full Level 1 -> 11 journey
-        full_upgrade_coins = sum(u["coins"] for u in upgrade_costs)
-        full_upgrade_pp = sum(u["power_points"] for u in upgrade_costs)
-        
-        total_coins_needed += (full_upgrade_coins * unowned_count)
-        total_pp_needed += (full_upgrade_pp * unowned_count)
+# ----------------------------
+# Profile embed render cache
+# ----------------------------
+# Rendered profile embeds (as payload dicts) per (tag, event, name). An entry
+# is reused only while the player data is the very same object brawltools.py
+# cached, so an unchanged profile costs one identity check; a refetched
+# profile is a new object and is rebuilt. Entries keep their player data
+# alive, so it counts against this cache's own byte budget.
+PROFILE_EMBED_CACHE_SIZE = int(config.get("PROFILE_EMBED_CACHE_SIZE", 256))
+profile_embed_cache = TTLCache(
+    "profile_embed",
+    ttl=math.inf,
+    max_entries=PROFILE_EMBED_CACHE_SIZE,
+    max_bytes=int(config.get("PROFILE_EMBED_CACHE_MAX_BYTES", 8 * 1024 * 1024)),
+    sizeof=lambda entry: json_size(entry[0]) + json_size(entry[2]),
+)
 
-    # 3. Calculate Star Power and Gadget costs for the WHOLE account
-    # Every brawler (97) should have 2 SPs and 2 Gadgets.
-    total_sp_possible = Brawlers * 2
-    total_gadgets_possible = Brawlers * 2
-    
-    missing_sp = total_sp_possible - total_starpowers_owned
-    missing_gadgets = total_gadgets_possible - total_gadgets_owned
-    
-    total_coins_needed += (missing_sp * COINS_PER_STARPOWER) 
-    total_coins_needed += (missing_gadgets * COINS_PER_GADGET)
-    
-    return total_coins_needed, total_pp_needed, total_starpowers_owned, total_gadgets_owned
+def _collect_render_cache_metrics(registry):
+    stats = profile_embed_cache.stats()
+    for field in ("entries", "bytes", "hits", "misses", "evictions"):
+        registry.set(f"cache_{field}", stats[field], cache=stats["name"])
 
+metrics.registry.register_collector(_collect_render_cache_metrics)
+
+def _catalog_version():
+    # Catalog totals appear in the embed, so a catalog refresh invalidates it
+    return catalog.count, catalog.star_powers_total, catalog.gadgets_total
 
 # Function to create the player profile embed (reused for join/leave)
-def create_profile_embed(pdata: dict, player_tag: str, event_type: str = None):
+async def create_profile_embed(pdata: dict, player_tag: str, event_type: str = None):
     """
     Creates the Discord embed for a player profile.
     
@@ -337,7 +285,7 @@ def create_profile_embed(pdata: dict, player_tag: str, event_type: str = None):
         name = pdata["name"]
         
         # Fetch full player data for detailed stats
-        tag_data = get_playerdata(player_tag)
+        tag_data = await get_playerdata(player_tag)
         if not tag_data or not tag_data.get("data"):
             return discord.Embed(
                 title=f"⚠️ {name} ({player_tag}) {event_type}", 
@@ -352,6 +300,22 @@ def create_profile_embed(pdata: dict, player_tag: str, event_type: str = None):
         # Called from /profile. pdata is the nested 'data' object.
         name = pdata["name"]
 
+    key = (player_tag, event_type, name)
+    version = _catalog_version()
+    cached, _ = profile_embed_cache.get(key)
+    if cached and cached[0] is pdata and cached[1] == version:
+        profile_embed_cache.hits += 1
+        payload = cached[2]
+    else:
+        profile_embed_cache.misses += 1
+        payload = build_profile_embed(pdata, name, player_tag, event_type).to_dict()
+        profile_embed_cache.set(key, (pdata, version, payload))
+    # A fresh Embed per call: callers may still modify what they get back
+    return discord.Embed.from_dict(payload)
+
+
+def build_profile_embed(pdata: dict, name: str, player_tag: str, event_type: str = None) -> discord.Embed:
+    """Builds the profile embed from full player data. Use create_profile_embed (cached) instead."""
     # --- Data Extraction & Calculation ---
     trophies = pdata["trophies"]
     fav_brawler = pdata["favouriteBrawler"]
@@ -359,10 +323,8 @@ def create_profile_embed(pdata: dict, player_tag: str, event_type: str = None):
     famepoints = pdata.get("famePoints", 0)
     brawlers = pdata["brawlers"]
     
-    total_coins_needed, total_pp_needed, total_starpowers, total_gadgets = calculate_costs(brawlers)
+    total_coins_needed, total_pp_needed, total_starpowers, total_gadgets = cost_to_max(brawlers)
 
-    count_1000_plus = sum(1 for b in brawlers if b["trophies"] >= 1000)
-    count_p11 = sum(1 for b in brawlers if b["power"] >= 11)
     solo = pdata["soloVictories"]
     duo = pdata["duoVictories"]
     RankElo = pdata["rankedPoints"]
@@ -373,20 +335,24 @@ def create_profile_embed(pdata: dict, player_tag: str, event_type: str = None):
     prestiges = pdata["prestige"]
     recordRank = pdata["recordRank"]
     recordPoints = pdata["recordPoints"]
-    brawler_count = len(pdata["brawlers"])
-    
-    season_trophies = 0
-    for b in pdata["brawlers"]:
+    brawler_count = len(brawlers)
+
+    # One pass over the brawlers for every per-brawler count
+    count_1000_plus = count_p11 = season_trophies = total_gears_owned = 0
+    for b in brawlers:
+        if b["trophies"] >= 1000:
+            count_1000_plus += 1
+        if b["power"] >= 11:
+            count_p11 += 1
         hst = b.get("highestSeasonTrophies", 0)
         if hst > 1000:
             season_trophies += (hst - 1000)
+        total_gears_owned += len(b.get("gears", []))
 
-    rank = get_rank_by_id(RankNumber)
-    highestrank = get_rank_by_id(HighestRankNumber)
-    box = get_player_box(season_trophies)
+    rank = catalog.rank(RankNumber)
+    highestrank = catalog.rank(HighestRankNumber)
+    box = catalog.box_for(season_trophies)
 
-    total_gears_owned = sum(len(b.get("gears", [])) for b in pdata["brawlers"])
-    
     fame_display = get_fame_tier(famepoints)
 
     # Top brawler icon
@@ -416,11 +382,11 @@ def create_profile_embed(pdata: dict, player_tag: str, event_type: str = None):
             f"{box['emojiid']} **Season Trophies:** {season_trophies}\n"
             f"<:BS_Prestige2:1449167208789049384> **Prestiges:** {prestiges}\n\n"
             f"**PROGRESSION**\n\n"
-            f"<:eyJwYXRoIjoic3VwZXJjZWxsXC9maWxl:1449146235616231454> **Brawlers:** {brawler_count}/{Brawlers}\n"
+            f"<:eyJwYXRoIjoic3VwZXJjZWxsXC9maWxl:1449146235616231454> **Brawlers:** {brawler_count}/{catalog.count}\n"
             f"<:p111:1449146020763140126> **Power 11's:** {count_p11}\n"
-            f"<:gadgeet:1449185766876905675> **Gadgets:** {total_gadgets}/{Brawlers*2}\n"
-            f"<:starpwer:1449185761030311997> **Starpowers:** {total_starpowers}/{Brawlers*2}\n"
-            f"<:gear_base_empty:1449189230617301012> **Gears:** {total_gears_owned}/{Brawlers*6}\n\n"
+            f"<:gadgeet:1449185766876905675> **Gadgets:** {total_gadgets}/{catalog.gadgets_total}\n"
+            f"<:starpwer:1449185761030311997> **Starpowers:** {total_starpowers}/{catalog.star_powers_total}\n"
+            f"<:gear_base_empty:1449189230617301012> **Gears:** {total_gears_owned}/{catalog.count*6}\n\n"
             f"**INFO**\n\n"
             f"{records[recordRank]} **Record:** {recordPoints}\n"
             f"**{fame_display}**\n"
@@ -478,52 +444,48 @@ async def profile(interaction: discord.Interaction, playertag: str, format: str
 
     # ---- IMAGE MODE ----
     if format and format.lower() == "image":
-        api_url = PlayerImageAPI.format(tag=tag)
-        filename = f"player_{tag}.png"
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(api_url) as resp:
-                    if resp.status != 200:
-                        await interaction.followup.send(f"❌ API error: `{resp.status}`")
-                        return
-                    img = await resp.read()
-            with open(filename, "wb") as f:
-                f.write(img)
-            await interaction.followup.send(file=discord.File(filename))
+            try:
+                img = await brawltools.get_player_image(tag)
+            except brawltools.BrawlToolsError as e:
+                await discord_send(interaction.followup, f"❌ API error: `{e.status or e}`")
+                return
+            # Straight from memory: no temp file for concurrent requests to collide on
+            await discord_send(interaction.followup, file=discord.File(io.BytesIO(img), filename=f"player_{tag}.png"))
         except Exception as e:
-            await interaction.followup.send(f"❌ Error: {e}")
-        finally:
-            if os.path.exists(filename):
-                os.remove(filename)
+            await discord_send(interaction.followup, f"❌ Error: {e}")
         return  # Stop here
 
-    pdata = get_playerdata(tag)
+    pdata = await get_playerdata(tag)
     if not pdata or not pdata.get("data"):
-        await interaction.followup.send("❌ Failed to load player data. Tag might be incorrect or API unavailable.")
+        await discord_send(interaction.followup, "❌ Failed to load player data. Tag might be incorrect or API unavailable.")
         return
 
-    embed = create_profile_embed(pdata["data"], player_tag=f"#{tag}")
-    await interaction.followup.send(embed=embed)
+    embed = await create_profile_embed(pdata["data"], player_tag=f"#{tag}")
+    await discord_send(interaction.followup, embed=embed)
 
 
 @tree.command(
     name="megapig",
     description="Shows the current Mega Pig participation for all club members."
 )
-async def megapig(interaction: discord.Interaction):
+@app_commands.describe(club="Club tag or name (default: the first tracked club)")
+async def megapig(interaction: discord.Interaction, club: str = None):
     import math
     await interaction.response.defer()
 
-    club_cache = data.get("club_cache")
-    if not club_cache or not club_cache.get("data"):
-        await interaction.followup.send("❌ Club data cache is empty or invalid.")
+    tracked = find_club(club)
+    if tracked is None:
+        await discord_send(interaction.followup, f"❌ Unknown club. Tracked: {', '.join(c.name for c in CLUBS)}")
         return
 
-    club_data = club_cache["data"]
-    members_list = club_data.get("members", [])
+    club_data = clubdiff.load_snapshot(tracked)
+    if not club_data:
+        await discord_send(interaction.followup, "❌ Club data cache is empty or invalid.")
+        return
 
     participating_members = []
-    for member in members_list:
+    for member in club_data["members"].values():
         mega = member.get("megaPig")
         if mega:
             participating_members.append({
@@ -533,7 +495,7 @@ async def megapig(interaction: discord.Interaction):
             })
 
     if not participating_members:
-        await interaction.followup.send("❌ No members have Mega Pig data yet.")
+        await discord_send(interaction.followup, "❌ No members have Mega Pig data yet.")
         return
 
     # Sort by wins (descending)
@@ -567,7 +529,7 @@ async def megapig(interaction: discord.Interaction):
 
     # ---------- Embed Construction ----------
     embed = discord.Embed(
-        title="<:mp:1454321208794288180> Mega Pig Participation",
+        title="<:mp:1454321208794288180> Mega Pig Participation" + (f" — {tracked.name}" if len(CLUBS) > 1 else ""),
         color=0xF5A623
     )
 
@@ -598,7 +560,7 @@ async def megapig(interaction: discord.Interaction):
     embed.add_field(name="<:mp:1454321208794288180> Stage:", value=f"{stage}/5", inline=True)
     embed.add_field(name="<:sd:1454330224316649705> Reward:", value=sd, inline=True)
 
-    await interaction.followup.send(embed=embed)
+    await discord_send(interaction.followup, embed=embed)
 
 
 
@@ -606,120 +568,330 @@ async def megapig(interaction: discord.Interaction):
 
 
 # ----------------------------
-# Club API polling task (RAW SAVE & JOIN/LEAVE TRACKING)
+# /costtomax command
 # ----------------------------
-async def club_api_poll_task():
-    """Periodically fetches club data and checks for join/leave events."""
-    await client.wait_until_ready()
-    
-    join_leave_channel = client.get_channel(JOIN_LEAVE_CHANNEL_ID)
-    if join_leave_channel is None:
-        print("Channel not found or bot has no access (JOIN_LEAVE_CHANNEL_ID)")
+@tree.command(name="costtomax", description="Club leaderboard of coins and power points still needed to max out")
+@app_commands.describe(
+    club="Club tag or name, or 'all' for every tracked club (default: the first tracked club)",
+    sort="Rank by 'coins' (default) or 'pp'"
+)
+async def costtomax(interaction: discord.Interaction, club: str = None, sort: str = "coins"):
+    await interaction.response.defer()
+
+    if club and club.strip().lower() == "all":
+        targets = CLUBS
+    else:
+        tracked = find_club(club)
+        if tracked is None:
+            await discord_send(interaction.followup, f"❌ Unknown club. Tracked: {', '.join(c.name for c in CLUBS)}")
+            return
+        targets = [tracked]
+
+    member_lists = await asyncio.gather(*(helpers.get_club_members(c.tag) for c in targets))
+    members = list({m["tag"]: m for ms in member_lists for m in ms if m.get("tag")}.values())
+    profiles = await helpers.gather_limited(members, lambda m: helpers.get_player_data(m["tag"]))
+    rows = [(m, p) for m, p in zip(members, profiles) if p]
+    if not rows:
+        await discord_send(interaction.followup, "❌ Could not load any member profiles.")
+        return
+
+    start = time.perf_counter()
+    costs = club_cost_to_max([p.get("brawlers", []) for _, p in rows])
+    elapsed = time.perf_counter() - start
+    metrics.observe("cost_to_max_seconds", elapsed)
+
+    key = 1 if sort and sort.strip().lower() in ("pp", "powerpoints", "power points") else 0
+    board = sorted(zip(rows, costs), key=lambda x: x[1][key])
+
+    lines = [
+        f"#{i} {m.get('name', m['tag'])} — <:icon_gold_coin:1449195153918005421> {c[0]:,} · <:Power_Points:1449195161249779866> {c[1]:,}"
+        for i, ((m, _), c) in enumerate(board, start=1)
+    ]
+    description = ""
+    for line in lines:
+        if len(description) + len(line) + 1 > 4000:
+            break
+        description += line + "\n"
+
+    title = "💰 Cost To Max" + (f" — {targets[0].name}" if len(targets) == 1 and len(CLUBS) > 1 else "")
+    embed = discord.Embed(title=title, description=description, color=discord.Color.gold())
+    embed.set_footer(text=f"{len(rows)} members · computed in {elapsed * 1000:.1f} ms")
+    await discord_send(interaction.followup, embed=embed)
+
+
+# ----------------------------
+# /history command
+# ----------------------------
+@tree.command(name="history", description="Trophy pushes over a time window, for one player or the whole club")
+@app_commands.describe(
+    days="How many days back to look (default 7)",
+    playertag="Show one player's push instead of the club leaderboard",
+    brawler="Limit to a single brawler (e.g. SHELLY)",
+    club="Club tag or name (default: the first tracked club)"
+)
+async def history_command(interaction: discord.Interaction, days: int = 7, playertag: str = None, brawler: str = None, club: str = None):
+    await interaction.response.defer()
+    tracked = find_club(club)
+    if tracked is None:
+        await discord_send(interaction.followup, f"❌ Unknown club. Tracked: {', '.join(c.name for c in CLUBS)}")
         return
+    await history.flush()
+
+    days = max(1, days)
+    start = int((datetime.now(timezone.utc) - timedelta(days=days)).timestamp())
+    series = brawler.upper() if brawler else TOTAL
+    label = brawler.upper() if brawler else "Trophies"
+
+    members = clubdiff.load_snapshot(tracked).get("members", {})
+    names = {tag: m.get("name") or tag for tag, m in members.items()}
+
+    # ---- Single player ----
+    if playertag:
+        tag = "#" + playertag.replace("#", "").upper()
+        name = names.get(tag, tag)
+        delta = history.change(tag, series, start)
+        if delta is None:
+            await discord_send(interaction.followup, f"❌ No history recorded for `{tag}` yet.")
+            return
+
+        lines = [f"<:tr:1449145784313581764> **{label}:** {delta:+}"]
+        if not brawler:
+            ranked_delta = history.change(tag, RANKED, start)
+            if ranked_delta:
+                lines.append(f"<:rd:1449159742155915304> **Ranked:** {ranked_delta:+} tiers")
+            top = sorted(history.brawler_changes(tag, start).items(), key=lambda x: x[1], reverse=True)[:10]
+            if top:
+                lines.append("")
+                lines.extend(f"**{b}** {d:+}" for b, d in top)
+
+        embed = discord.Embed(
+            title=f"{name} — last {days} day(s)",
+            description="\n".join(lines),
+            color=discord.Color.blue()
+        )
+        await discord_send(interaction.followup, embed=embed)
+        return
+
+    # ---- Club leaderboard ----
+    board = history.leaderboard(series, start, tags=names.keys() if names else None)
+    if not board:
+        await discord_send(interaction.followup, "❌ No history recorded for this window yet.")
+        return
+
+    lines = [f"#{i} {names.get(tag, tag)} — {delta:+}" for i, (tag, delta) in enumerate(board[:25], start=1)]
+    embed = discord.Embed(
+        title=f"📈 {label} pushed — last {days} day(s)" + (f" — {tracked.name}" if len(CLUBS) > 1 else ""),
+        description="\n".join(lines),
+        color=discord.Color.blue()
+    )
+    await discord_send(interaction.followup, embed=embed)
+
+
+# ----------------------------
+# /botstats command (admins only)
+# ----------------------------
+def format_botstats() -> str:
+    """Builds the /botstats summary from the metrics registry."""
+    registry = metrics.registry
+    lines = ["**UPSTREAM**"]
+    for (name, labels), hist in sorted(registry.histograms.items()):
+        if name != "upstream_request_seconds":
+            continue
+        label = dict(labels)
+        errors = sum(
+            v for (n, l), v in registry.counters.items()
+            if n == "upstream_requests_total" and dict(l).get("endpoint") == label["endpoint"]
+            and dict(l).get("host") == label["host"] and dict(l).get("status") not in ("200", "304")
+        )
+        lines.append(
+            f"`{label['endpoint']}` {hist.count} req · p50 {hist.quantile(0.5):.2f}s · "
+            f"p95 {hist.quantile(0.95):.2f}s · {errors} err"
+        )
 
-    async with aiohttp.ClientSession() as session:
-        while not client.is_closed():
+    lines.append("\n**POLL CYCLES**")
+    for (name, labels), hist in sorted(registry.histograms.items()):
+        if name == "poll_cycle_seconds":
+            label = dict(labels)
+            job = f"{label['job']} {label['club']}" if "club" in label else label["job"]
+            lines.append(f"`{job}` {hist.count} runs · p50 {hist.quantile(0.5):.1f}s · max {hist.max:.1f}s")
+
+    lines.append("\n**CACHES**")
+    for stats in brawltools.cache_stats() + [profile_embed_cache.stats()]:
+        lines.append(f"`{stats['name']}` {stats['entries']} entries · hit rate {stats['hit_rate']:.0%}")
+
+    lines.append("\n**JOBS**")
+    for job in jobs.jobs.values():
+        line = f"`{job.name}` {job.state} · {job.runs} runs · {job.failures} failed"
+        if job.last_error:
+            line += f" (last: {job.last_error[:80]})"
+        lines.append(line)
+
+    lines.append("\n**DISCORD / LOOP**")
+    for name, label in (("discord_send_seconds", "Send"), ("event_loop_lag_seconds", "Loop lag")):
+        hist = registry.histograms.get((name, ()))
+        if hist:
+            lines.append(f"{label}: p95 {hist.quantile(0.95):.3f}s · max {hist.max:.3f}s")
+
+    lines.append(
+        f"Retry budget: {helpers.retry_budget.tokens:.1f} tokens · exhausted {helpers.retry_budget.exhausted}x · "
+        f"breakers: brawlstars {helpers.api_policy.breaker.state}, brawltools {brawltools.policy.breaker.state}"
+    )
+    lines.append(
+        f"Retries: brawlstars {helpers.api_policy.retries}, brawltools {brawltools.policy.retries} · "
+        f"coalesced: brawlstars {helpers.inflight.shared}, brawltools {brawltools.inflight.shared}"
+    )
+    return "\n".join(lines)
+
+@tree.command(name="botstats", description="Request latencies, cache hit rates and poll timings (admins only)")
+@app_commands.default_permissions(administrator=True)
+@app_commands.guild_only()
+async def botstats(interaction: discord.Interaction):
+    # guild_only hides the command in DMs; the guild check also covers stale registrations
+    if interaction.guild is None or not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ Admins only.", ephemeral=True)
+        return
+    embed = discord.Embed(title="📊 Bot Stats", description=format_botstats()[:4000], color=discord.Color.blue())
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+# ----------------------------
+# Club API polling task (RAW SAVE & JOIN/LEAVE TRACKING)
+# ----------------------------
+async def check_club_changes(club, join_leave_channel):
+    """
+    One club poll: diffs the new snapshot against the stored one, posts
+    joins/leaves and stores the snapshot if anything changed. Returns the
+    change events (see clubdiff.py), or None if the club could not be fetched.
+    """
+    cycle_start = time.perf_counter()
+    try:
+        club_json = await brawltools.get_club(club.tag)
+    except brawltools.BrawlToolsError as e:
+        print(f"[CLUB API] {club.name}: HTTP {e.status or e}")
+        return None
+
+    old_snapshot = clubdiff.load_snapshot(club)
+    new_snapshot = clubdiff.normalize(club_json)
+    events = clubdiff.diff(old_snapshot, new_snapshot)
+
+    for event in events:
+        metrics.inc("club_events_total", kind=event.kind, club=club.tag)
+
+        # --- MEMBERS WHO JOINED ---
+        if event.kind == clubdiff.JOIN:
+            # Fetch full player data and send JOINED embed
+            joined_embed = await create_profile_embed(event.new, player_tag=event.tag, event_type="JOINED")
+            await discord_send(join_leave_channel, embed=joined_embed)
+            print(f"[CLUB API] Detected JOIN: {event.name} ({event.tag})")
+
+        # --- MEMBERS WHO LEFT ---
+        elif event.kind == clubdiff.LEAVE:
+            member_data = event.old # Use old data to get name/role
+            
+            # Send LEFT embed 
             try:
-                async with session.get(ClubAPI) as resp:
-                    if resp.status != 200:
-                        print(f"[CLUB API] HTTP {resp.status}")
-                        await asyncio.sleep(UPDATE_TIME)
-                        continue
-
-                    club_json = await resp.json()
-                    new_members_list = club_json.get("data", {}).get("members", [])
-                    new_member_tags = {member["tag"] for member in new_members_list}
-
-                    # Get old member list from cache
-                    old_club_cache = data.get("club_cache", {})
-                    old_members_list = old_club_cache.get("data", {}).get("members", [])
-                    old_member_tags = {member["tag"] for member in old_members_list}
-                    
-                    # Map tags to full member data for easy access
-                    old_members_map = {member["tag"]: member for member in old_members_list}
-                    new_members_map = {member["tag"]: member for member in new_members_list}
-
-                    # Tracking Logic only runs if there was an old cache
-                    if old_member_tags:
-                        
-                        # --- MEMBERS WHO JOINED ---
-                        joined_tags = new_member_tags - old_member_tags
-                        for tag in joined_tags:
-                            member_data = new_members_map[tag]
-                            # Fetch full player data and send JOINED embed
-                            joined_embed = create_profile_embed(member_data, player_tag=tag, event_type="JOINED")
-                            await join_leave_channel.send(embed=joined_embed)
-                            print(f"[CLUB API] Detected JOIN: {member_data['name']} ({tag})")
-
-
-                        # --- MEMBERS WHO LEFT ---
-                        left_tags = old_member_tags - new_member_tags
-                        for tag in left_tags:
-                            member_data = old_members_map[tag] # Use old data to get name/tag
-                            
-                            # Send LEFT embed 
-                            try:
-                                left_embed = create_profile_embed(member_data, player_tag=tag, event_type="LEFT")
-                                await join_leave_channel.send(embed=left_embed)
-
-                            except Exception as e:
-                                # Fallback if profile API fails for the left member
-                                embed = discord.Embed(
-                                    title=f"❌ {member_data.get('name', 'Unknown Player')} LEFT the Club!",
-                                    description=f"Tag: `{tag}`\nClub Role: **{member_data.get('role', 'unknown').capitalize()}**\nTrophies: **{member_data.get('trophies', '?')}**",
-                                    color=discord.Color.red()
-                                )
-                                await join_leave_channel.send(embed=embed)
-                                print(f"[CLUB API] Error sending detailed LEFT notification for {tag}: {e}")
-
-                            print(f"[CLUB API] Detected LEFT: {member_data.get('name', 'Unknown Player')} ({tag})")
-
-
-                    # SAVE NEW CACHE (MUST BE DONE AFTER ALL CHECKS)
-                    data["club_cache"] = club_json
-                    save_data(data)
-
-                    member_count = len(new_members_list)
-                    print(f"[CLUB API] Cached RAW club data ({member_count} members). Join/Leave check complete.")
+                left_embed = await create_profile_embed(member_data, player_tag=event.tag, event_type="LEFT")
+                await discord_send(join_leave_channel, embed=left_embed)
 
             except Exception as e:
-                print("[CLUB API] Exception:", e)
-
-            await asyncio.sleep(UPDATE_TIME)
+                # Fallback if profile API fails for the left member
+                embed = discord.Embed(
+                    title=f"❌ {member_data.get('name') or 'Unknown Player'} LEFT the Club!",
+                    description=f"Tag: `{event.tag}`\nClub Role: **{(member_data.get('role') or 'unknown').capitalize()}**\nTrophies: **{member_data.get('trophies', '?')}**",
+                    color=discord.Color.red()
+                )
+                await discord_send(join_leave_channel, embed=embed)
+                print(f"[CLUB API] Error sending detailed LEFT notification for {event.tag}: {e}")
+
+            print(f"[CLUB API] Detected LEFT: {member_data.get('name') or 'Unknown Player'} ({event.tag})")
+
+        elif event.kind in (clubdiff.ROLE, clubdiff.NAME):
+            print(f"[CLUB API] {event.name} ({event.tag}) {event.kind}: {event.old} -> {event.new}")
+
+    # SAVE NEW SNAPSHOT (MUST BE DONE AFTER ALL CHECKS); unchanged snapshots are not rewritten
+    if new_snapshot != old_snapshot:
+        club.state.set_club_snapshot(new_snapshot)
+
+    print(f"[CLUB API] {club.name}: {len(new_snapshot.get('members', {}))} members, {len(events)} change(s). Join/Leave check complete.")
+    metrics.observe("poll_cycle_seconds", time.perf_counter() - cycle_start, job="club", club=club.tag)
+    return events
+
+async def poll_club_changes():
+    """Fetches club data and checks for join/leave events in every club."""
+    targets = club_channels("join_leave_channel_id", "JoinLeaveChannel")
+    results = await asyncio.gather(
+        *(check_club_changes(club, channel) for club, channel in targets),
+        return_exceptions=True,
+    )
+    for (club, _), result in zip(targets, results):
+        if isinstance(result, Exception):
+            print(f"[CLUB API] {club.name}: Exception:", result)
 
 
 
 # ----------------------------
 # Events
 # ----------------------------
+jobs.add("club_images", send_club_images, every=UPDATE_TIME)
+jobs.add("club_changes", poll_club_changes, every=UPDATE_TIME)
+jobs.add("global_leaderboard", post_global_leaderboard_summary, every=600)
+jobs.add("loop_lag", metrics.monitor_event_loop_lag)
+jobs.add("catalog", catalog.refresh_loop)
+
+commands_synced = False
+
 @client.event
 async def on_ready():
-    """Event fired when the bot is ready and connected to Discord."""
-    await tree.sync()
+    """Event fired when the bot is ready and connected to Discord (again after every reconnect)."""
+    global commands_synced
+    if not commands_synced:
+        startup.mark("ready")
+        print(f"🚀 Startup: {startup.report()}")
+        await tree.sync()
+        commands_synced = True
     print(f"Logged in as {client.user} (slash commands synced!)")
 
 @client.event
 async def setup_hook():
-    """Sets up the asynchronous tasks when the bot starts."""
-    client.loop.create_task(send_club_image_task())
-    client.loop.create_task(club_api_poll_task())
-    client.loop.create_task(post_global_leaderboard_summary(client))
+    """Starts the background jobs (bot.py's and milestones.py's) once per process."""
+    startup.mark("login")
+    jobs.start(client)
+
+    global metrics_runner
+    if METRICS_PORT:
+        try:
+            metrics_runner = await metrics.start_http_server(METRICS_PORT)
+        except OSError as e:
+            print(f"⚠️ Could not start metrics endpoint on port {METRICS_PORT}: {e}")
+
+metrics_runner = None
 
 # ----------------------------
 # Run bot
 # ----------------------------
+async def main():
+    """Runs the bot and every background job, and releases the shared HTTP session on exit."""
+    try:
+        async with client:
+            try:
+                await client.start(TOKEN)
+            finally:
+                # Let the trackers finish their pass while the client can still post
+                await milestones.stop_workers()
+    finally:
+        # Then cancel whatever is left
+        await jobs.stop()
+        await flush_all()
+        await history.flush()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        await helpers.close_session()
+
 if __name__ == "__main__":
     if TOKEN:
-        # Run both bots concurrently
-        loop = asyncio.get_event_loop()
-        
-        # Start the main bot (700 line script)
-        loop.create_task(client.start(TOKEN))
-        
-        # Start the milestones tracking bot
-        loop.create_task(milestones.client.start(milestones.DISCORD_TOKEN))
-        
-        # Keep the loop running
-        loop.run_forever()
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            pass
     else:
         print("Bot token is missing. Please check the 'token' field in data.json.")
\ No newline at end of file
@@ -0,0 +1,181 @@
+import json
+import time
+import asyncio
+import aiohttp
+
+from config import config
+from helpers import get_session, make_host_policy
+from resilience import RetryableError, CircuitOpenError, parse_retry_after
+import metrics
+from cache import TTLCache, ImageCache, json_size
+from singleflight import SingleFlight
+
+# ------------------ brawltools.net API ------------------ #
+# Profiles, club data and rendered cards come from brawltools rather than
+# the official API. Everything here shares the pooled session from helpers.
+
+BASE_URL = config.get("BRAWLTOOLS_BASE_URL", "https://api.brawltools.net/")
+
+PlayerAPI = BASE_URL + "players/{tag}"
+ClubAPI = BASE_URL + "clubs/{tag}"
+PlayerImageAPI = BASE_URL + "players/{tag}/image?option=8&quality=high"
+ClubImageAPI = BASE_URL + "clubs/{tag}/image?option=2&quality=high"
+
+BRAWLTOOLS_TIMEOUT = float(config.get("BRAWLTOOLS_TIMEOUT", 15))
+# Card renders are noticeably slower than JSON lookups
+BRAWLTOOLS_IMAGE_TIMEOUT = float(config.get("BRAWLTOOLS_IMAGE_TIMEOUT", 30))
+
+# ------------------ Response Caches ------------------ #
+# One cache per endpoint, keyed by normalized tag. Profiles are served stale
+# for a while and refreshed in the background; club data is only ever fresh
+# so join/leave detection never runs on an old member list.
+
+player_cache = TTLCache(
+    "player",
+    ttl=float(config.get("PROFILE_CACHE_TTL", 120)),
+    stale_ttl=float(config.get("PROFILE_CACHE_STALE", 600)),
+    max_entries=int(config.get("PROFILE_CACHE_MAX_ENTRIES", 500)),
+    max_bytes=int(config.get("PROFILE_CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+    sizeof=json_size,
+)
+
+club_cache = TTLCache(
+    "club",
+    ttl=float(config.get("CLUB_CACHE_TTL", 30)),
+    max_entries=16,
+    sizeof=json_size,
+)
+
+# Rendered cards, keyed by render URL. IMAGE_CACHE_DIR (unset by default)
+# also keeps them on disk across restarts.
+image_cache = ImageCache(
+    "image",
+    ttl=float(config.get("IMAGE_CACHE_TTL", 300)),
+    max_entries=int(config.get("IMAGE_CACHE_MAX_ENTRIES", 128)),
+    max_bytes=int(config.get("IMAGE_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    directory=config.get("IMAGE_CACHE_DIR") or None,
+    max_files=int(config.get("IMAGE_CACHE_MAX_FILES", 512)),
+)
+
+# Identical concurrent requests share one upstream call
+inflight = SingleFlight()
+policy = make_host_policy("api.brawltools.net")
+
+def cache_stats() -> list:
+    """Hit/miss counters for every brawltools response cache."""
+    return [player_cache.stats(), club_cache.stats(), image_cache.stats()]
+
+def _collect_cache_metrics(registry):
+    for stats in cache_stats():
+        for field in ("entries", "bytes", "hits", "stale_hits", "misses", "evictions"):
+            registry.set(f"cache_{field}", stats[field], cache=stats["name"])
+    registry.set("upstream_retries", policy.retries, host=policy.host)
+    registry.set("singleflight_shared", inflight.shared, host=policy.host)
+
+metrics.registry.register_collector(_collect_cache_metrics)
+
+# ------------------ Errors ------------------ #
+
+class BrawlToolsError(Exception):
+    """Base error for brawltools requests. `status` is the HTTP status, if any."""
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+class NotFound(BrawlToolsError):
+    """The tag does not exist (404)."""
+
+class RateLimited(BrawlToolsError, RetryableError):
+    """brawltools asked us to slow down (429)."""
+
+    def __init__(self, message: str, status: int = None, retry_after: float = None):
+        BrawlToolsError.__init__(self, message, status)
+        self.retry_after = retry_after
+        self.trips_breaker = False
+
+class Unavailable(BrawlToolsError, RetryableError):
+    """brawltools is down, timed out or returned a 5xx."""
+
+    def __init__(self, message: str, status: int = None):
+        BrawlToolsError.__init__(self, message, status)
+        self.retry_after = None
+        self.trips_breaker = True
+
+def normalize_tag(tag: str) -> str:
+    """Returns the tag without '#', upper-cased (the form brawltools URLs use)."""
+    return tag.replace("#", "").strip().upper()
+
+# ------------------ Requests ------------------ #
+
+async def _request(url: str, *, binary: bool = False, timeout: float = BRAWLTOOLS_TIMEOUT):
+    """
+    GETs a brawltools URL and returns decoded JSON (or raw bytes when binary=True).
+    Raises a BrawlToolsError subclass on any failure. Concurrent calls for the
+    same URL share one request, including its error.
+    """
+    return await inflight.do(url, lambda: _get(url, binary, timeout))
+
+async def _get(url: str, binary: bool, timeout: float):
+    """Runs _get_once under the retry/circuit-breaker policy."""
+    try:
+        return await policy.run(lambda: _get_once(url, binary, timeout))
+    except CircuitOpenError as e:
+        raise Unavailable(str(e)) from e
+
+async def _get_once(url: str, binary: bool, timeout: float):
+    session = get_session()
+    start = time.perf_counter()
+    status = "error"
+    try:
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            status = resp.status
+            if resp.status == 404:
+                raise NotFound(f"Not found: {url}", resp.status)
+            if resp.status == 429:
+                raise RateLimited(
+                    "brawltools rate limit hit",
+                    resp.status,
+                    retry_after=parse_retry_after(resp.headers.get("Retry-After")),
+                )
+            if resp.status >= 500:
+                raise Unavailable(f"brawltools returned {resp.status}", resp.status)
+            if resp.status != 200:
+                raise BrawlToolsError(f"brawltools returned {resp.status}", resp.status)
+
+            body = await resp.read()
+    except asyncio.TimeoutError as e:
+        status = "timeout"
+        raise Unavailable(f"brawltools timed out after {timeout}s") from e
+    except aiohttp.ClientError as e:
+        status = "connection_error"
+        raise Unavailable(f"brawltools connection error: {e}") from e
+    finally:
+        metrics.record_request("api.brawltools.net", url[len(BASE_URL):], status, time.perf_counter() - start)
+
+    if binary:
+        return body
+    try:
+        return json.loads(body)
+    except ValueError as e:
+        raise BrawlToolsError("brawltools returned invalid JSON", 200) from e
+
+async def get_player(tag: str) -> dict:
+    """Returns the full brawltools player response ({"data": {...}})."""
+    tag = normalize_tag(tag)
+    return await player_cache.get_or_fetch(tag, lambda: _request(PlayerAPI.format(tag=tag)))
+
+async def get_club(tag: str) -> dict:
+    """Returns the full brawltools club response ({"data": {...}})."""
+    tag = normalize_tag(tag)
+    return await club_cache.get_or_fetch(tag, lambda: _request(ClubAPI.format(tag=tag)))
+
+async def get_player_image(tag: str) -> bytes:
+    """Returns the rendered player card as PNG bytes."""
+    url = PlayerImageAPI.format(tag=normalize_tag(tag))
+    return await image_cache.get_or_fetch(url, lambda: _request(url, binary=True, timeout=BRAWLTOOLS_IMAGE_TIMEOUT))
+
+async def get_club_image(tag: str) -> bytes:
+    """Returns the rendered club card as PNG bytes."""
+    url = ClubImageAPI.format(tag=normalize_tag(tag))
+    return await image_cache.get_or_fetch(url, lambda: _request(url, binary=True, timeout=BRAWLTOOLS_IMAGE_TIMEOUT))
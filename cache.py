@@ -0,0 +1,270 @@
+import os
+import json
+import math
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+
+# ------------------ TTL + LRU Cache ------------------ #
+# Entries are fresh for `ttl` seconds, then servable-but-stale for another
+# `stale_ttl` seconds while a background refresh runs. Past that they are
+# treated as a miss. Size is bounded by entry count and an approximate
+# byte budget; the least recently used entries are evicted first.
+
+def json_size(value) -> int:
+    """Approximate size of a JSON-like value, for TTLCache(sizeof=...)."""
+    return len(json.dumps(value, separators=(",", ":")))
+
+class TTLCache:
+    def __init__(self, name: str, ttl: float, stale_ttl: float = 0,
+                 max_entries: int = 1024, max_bytes: int = None, sizeof=None):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+
+        self._entries = OrderedDict()   # key -> (value, stored_at, size)
+        self._bytes = 0
+        self._refreshing = {}           # key -> background refresh task
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _age(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return time.monotonic() - entry[1]
+
+    def get(self, key):
+        """
+        Returns (value, state) where state is "fresh", "stale" or None (miss).
+        Does not update the hit/miss counters.
+        """
+        age = self._age(key)
+        if age is None:
+            return None, None
+        if age <= self.ttl:
+            self._entries.move_to_end(key)
+            return self._entries[key][0], "fresh"
+        if age <= self.ttl + self.stale_ttl:
+            self._entries.move_to_end(key)
+            return self._entries[key][0], "stale"
+        self.pop(key)
+        return None, None
+
+    def set(self, key, value):
+        self.pop(key)
+        size = self.sizeof(value)
+        self._entries[key] = (value, time.monotonic(), size)
+        self._bytes += size
+        self._evict()
+
+    def pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    async def get_or_fetch(self, key, fetch):
+        """
+        Returns the cached value for `key`, calling `await fetch()` on a miss.
+        A stale value is returned immediately and refreshed in the background.
+        Errors from `fetch` propagate on a miss and are logged on a refresh.
+        """
+        value, state = self.get(key)
+        if state == "fresh":
+            self.hits += 1
+            return value
+        if state == "stale":
+            self.stale_hits += 1
+            if key not in self._refreshing:
+                task = asyncio.create_task(self._refresh(key, fetch))
+                self._refreshing[key] = task
+            return value
+
+        self.misses += 1
+        value = await fetch()
+        self.set(key, value)
+        return value
+
+    async def _refresh(self, key, fetch):
+        try:
+            self.set(key, await fetch())
+        except Exception as e:
+            print(f"⚠️ [{self.name} cache] Background refresh failed for {key}: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
+
+# ------------------ Content-Addressed Image Cache ------------------ #
+# Rendered cards keyed by what was asked for (e.g. the render URL). The key
+# only points at a SHA-256 digest; the bytes are stored once per digest, so
+# identical renders of different keys share memory. With `directory` set the
+# blobs (<digest>.png) and key -> digest refs also go to disk and survive a
+# restart; the disk copy follows the same TTL and a file-count bound.
+
+class ImageCache:
+    def __init__(self, name: str, ttl: float, max_entries: int = 256,
+                 max_bytes: int = 64 * 1024 * 1024, directory: str = None, max_files: int = 512):
+        self.name = name
+        self.ttl = ttl
+        self.directory = directory
+        self.max_files = max_files
+
+        self._refs = TTLCache(f"{name}_refs", ttl=ttl, max_entries=max_entries)  # key -> digest
+        self._blobs = TTLCache(name, ttl=math.inf, max_entries=max_entries, max_bytes=max_bytes, sizeof=len)
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if directory:
+            os.makedirs(os.path.join(directory, "refs"), exist_ok=True)
+
+    def _lookup(self, key):
+        digest, state = self._refs.get(key)
+        if state is None:
+            return None
+        blob, _ = self._blobs.get(digest)
+        return blob
+
+    async def get_or_fetch(self, key: str, fetch) -> bytes:
+        """Returns the cached image for `key`, calling `await fetch()` (bytes) on a miss."""
+        blob = self._lookup(key)
+        if blob is not None:
+            self.hits += 1
+            return blob
+
+        if self.directory:
+            found = await asyncio.to_thread(self._disk_read, key)
+            if found:
+                digest, blob = found
+                self._refs.set(key, digest)
+                self._blobs.set(digest, blob)
+                self.disk_hits += 1
+                return blob
+
+        self.misses += 1
+        blob = await fetch()
+        digest = hashlib.sha256(blob).hexdigest()
+        self._refs.set(key, digest)
+        self._blobs.set(digest, blob)
+        if self.directory:
+            try:
+                await asyncio.to_thread(self._disk_write, key, digest, blob)
+            except OSError as e:
+                print(f"⚠️ [{self.name} cache] Could not write {digest[:12]} to disk: {e}")
+        return blob
+
+    # ----------------- Disk ----------------- #
+
+    def _ref_path(self, key: str) -> str:
+        return os.path.join(self.directory, "refs", hashlib.sha256(key.encode()).hexdigest())
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.png")
+
+    def _disk_read(self, key: str):
+        ref = self._ref_path(key)
+        try:
+            if time.time() - os.path.getmtime(ref) > self.ttl:
+                return None
+            with open(ref, "r") as f:
+                digest = f.read().strip()
+            with open(self._blob_path(digest), "rb") as f:
+                return digest, f.read()
+        except (OSError, ValueError):
+            return None
+
+    def _disk_write(self, key: str, digest: str, blob: bytes):
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(blob)
+            os.replace(f"{path}.tmp", path)
+        else:
+            os.utime(path)
+        with open(self._ref_path(key), "w") as f:
+            f.write(digest)
+        self._disk_prune()
+
+    def _disk_prune(self):
+        """Drops expired refs, then blobs no ref points at, then the oldest blobs over max_files."""
+        refs_dir = os.path.join(self.directory, "refs")
+        now = time.time()
+        live = set()
+        for name in os.listdir(refs_dir):
+            path = os.path.join(refs_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+                    continue
+                with open(path, "r") as f:
+                    live.add(f.read().strip())
+            except OSError:
+                continue
+
+        blobs = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".png"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if name[:-4] not in live:
+                    os.remove(path)
+                else:
+                    blobs.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        for _, path in sorted(blobs)[:max(0, len(blobs) - self.max_files)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        blobs = self._blobs.stats()
+        return {
+            "name": self.name,
+            "entries": blobs["entries"],
+            "bytes": blobs["bytes"],
+            "hits": self.hits + self.disk_hits,
+            "stale_hits": 0,
+            "misses": self.misses,
+            "evictions": blobs["evictions"],
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import asyncio
+from bisect import bisect_right
+
+import info
+from config import config
+from helpers import fetch_api, BRAWLER_CATALOG_TTL
+from persist import atomic_write_json
+
+# ------------------ Game Data Catalog ------------------ #
+# Indexed lookups for ranks, trophy boxes, brawlers and brawler emojis. The
+# brawler roster comes from /v1/brawlers (refreshed every BRAWLER_CATALOG_TTL
+# and kept in CATALOG_FILE across restarts) so counts used by the max-out math
+# follow the real game; info.py only supplies what the API does not have
+# (rank/box artwork, Discord emoji ids).
+
+CATALOG_FILE = config.get("CATALOG_FILE", "catalog.json")
+
+def _brawler_key(name: str) -> str:
+    return (name or "").strip().upper()
+
+class Catalog:
+    def __init__(self, path: str = CATALOG_FILE):
+        self.path = path
+        self.updated = 0.0
+        # One refresh at a time: callers that find the roster stale together share it
+        self._refresh_lock = asyncio.Lock()
+
+        self.ranks = {r["id"]: r for r in info.Ranks}
+
+        # Boxes sorted by threshold; _box_amounts is the bisect key
+        self.boxes = sorted(info.Boxes, key=lambda b: b["amount"])
+        self._box_amounts = [b["amount"] for b in self.boxes]
+
+        self._emoji_by_name = {_brawler_key(b["name"]): b["emojiid"] for b in info.brawlers_with_emojiid}
+        self._emoji_by_id = {b["id"]: b["emojiid"] for b in info.brawlers_with_emojiid}
+
+        # Until the API (or the disk cache) answers, the emoji list is the roster
+        self._set_roster([{"id": b["id"], "name": b["name"]} for b in info.brawlers_with_emojiid])
+        self.load()
+
+    # ----------------- Roster ----------------- #
+
+    def _set_roster(self, brawlers: list):
+        self.brawlers = sorted(brawlers, key=lambda b: b["id"])
+        self.by_id = {b["id"]: b for b in self.brawlers}
+        self.by_name = {_brawler_key(b["name"]): b for b in self.brawlers}
+        self.count = len(self.brawlers)
+        # Entries without the lists (the info.py fallback) count as two of each
+        self.star_powers_total = sum(b.get("starPowers", 2) for b in self.brawlers)
+        self.gadgets_total = sum(b.get("gadgets", 2) for b in self.brawlers)
+
+    def load(self):
+        """Loads the roster saved by the last refresh, if any."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+            self._set_roster(saved["brawlers"])
+            self.updated = saved.get("updated", 0.0)
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            print(f"⚠️ Ignoring unreadable {self.path}: {e}")
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Reloads the roster from /v1/brawlers if it is older than BRAWLER_CATALOG_TTL."""
+        requested = time.time()
+        async with self._refresh_lock:
+            # Re-checked under the lock: a refresh that finished while we waited counts
+            if self.updated >= requested or (not force and time.time() - self.updated < BRAWLER_CATALOG_TTL):
+                return True
+            data = await fetch_api("brawlers")
+            if not data or not data.get("items"):
+                # Keep the old roster; better slightly stale than empty
+                print("⚠️ Brawler catalog refresh failed, keeping the cached roster")
+                return False
+
+            roster = [
+                {
+                    "id": b["id"],
+                    "name": b.get("name", ""),
+                    "starPowers": len(b.get("starPowers", [])),
+                    "gadgets": len(b.get("gadgets", [])),
+                }
+                for b in data["items"]
+            ]
+            self._set_roster(roster)
+            self.updated = time.time()
+            await asyncio.to_thread(atomic_write_json, self.path, {"updated": self.updated, "brawlers": roster}, None)
+            print(f"✅ Brawler catalog refreshed ({self.count} brawlers)")
+            return True
+
+    async def refresh_loop(self):
+        """Keeps the roster fresh; runs forever."""
+        while True:
+            await self.refresh()
+            await asyncio.sleep(max(60, self.updated + BRAWLER_CATALOG_TTL - time.time()))
+
+    # ----------------- Lookups ----------------- #
+
+    def rank(self, rank_id):
+        return self.ranks.get(rank_id)
+
+    def brawler(self, brawler_id):
+        return self.by_id.get(brawler_id)
+
+    def brawler_by_name(self, name: str):
+        return self.by_name.get(_brawler_key(name))
+
+    def emoji(self, brawler) -> str:
+        """Discord emoji id for a brawler given by id or name ("" if none)."""
+        if isinstance(brawler, int):
+            return self._emoji_by_id.get(brawler, "")
+        return self._emoji_by_name.get(_brawler_key(brawler), "")
+
+    def box_for(self, amount: int):
+        """Highest trophy box reached with `amount` extra trophies, or None."""
+        i = bisect_right(self._box_amounts, amount)
+        return self.boxes[i - 1] if i else None
+
+    def boxes_between(self, low: int, high: int) -> list:
+        """Boxes with low < amount <= high, in ascending order."""
+        return self.boxes[bisect_right(self._box_amounts, low):bisect_right(self._box_amounts, high)]
+
+catalog = Catalog()
@@ -0,0 +1,80 @@
+from collections import namedtuple
+
+# ------------------ Club Snapshot Diff ------------------ #
+# The club poll keeps a compact, normalized snapshot (only the fields the bot
+# reads) instead of the raw brawltools payload, and turns two consecutive
+# snapshots into typed change events. Consumers act on events rather than
+# re-diffing member lists.
+#
+# Snapshot shape:
+#   {"tag", "name", "trophies", "megaPig": {"totalWins", "totalPlayed"},
+#    "members": {tag: {"name", "role", "trophies", "megaPig": {"wins", "ticketsLeft"} | None}}}
+
+# Event kinds
+JOIN = "join"
+LEAVE = "leave"
+ROLE = "role"
+NAME = "name"
+TROPHIES = "trophies"
+MEGAPIG = "megapig"
+
+# `old` / `new`: the member entry for JOIN / LEAVE, otherwise the changed value
+ClubEvent = namedtuple("ClubEvent", "kind tag name old new")
+
+def _member(raw: dict) -> dict:
+    mega = raw.get("megaPig")
+    return {
+        "name": raw.get("name", ""),
+        "role": raw.get("role", ""),
+        "trophies": raw.get("trophies", 0),
+        "megaPig": {"wins": mega.get("wins", 0), "ticketsLeft": mega.get("ticketsLeft", 0)} if mega else None,
+    }
+
+def normalize(club_json: dict) -> dict:
+    """
+    Compact snapshot of a brawltools club response ({"data": {...}}).
+    Snapshots that are already normalized are returned unchanged.
+    """
+    if not club_json:
+        return {}
+    if "members" in club_json and "data" not in club_json:
+        return club_json
+    data = club_json.get("data") or {}
+    mega = data.get("megaPig") or {}
+    return {
+        "tag": data.get("tag", ""),
+        "name": data.get("name", ""),
+        "trophies": data.get("trophies", 0),
+        "megaPig": {"totalWins": mega.get("totalWins", 0), "totalPlayed": mega.get("totalPlayed", 0)},
+        "members": {m["tag"]: _member(m) for m in data.get("members", []) if m.get("tag")},
+    }
+
+def load_snapshot(club) -> dict:
+    """The club's last stored snapshot, normalized (older stores hold the raw payload)."""
+    return normalize(club.state.get_club_snapshot())
+
+def diff(old: dict, new: dict) -> list:
+    """
+    Change events from snapshot `old` to `new`. Nothing is reported against
+    an empty `old` (first poll), so a fresh install does not announce every
+    member as joined.
+    """
+    old_members = (old or {}).get("members") or {}
+    new_members = new.get("members") or {}
+    if not old_members:
+        return []
+
+    events = []
+    for tag, member in new_members.items():
+        before = old_members.get(tag)
+        if before is None:
+            events.append(ClubEvent(JOIN, tag, member["name"], None, member))
+            continue
+        for kind, field in ((NAME, "name"), (ROLE, "role"), (TROPHIES, "trophies"), (MEGAPIG, "megaPig")):
+            if before.get(field) != member[field]:
+                events.append(ClubEvent(kind, tag, member["name"], before.get(field), member[field]))
+
+    for tag, member in old_members.items():
+        if tag not in new_members:
+            events.append(ClubEvent(LEAVE, tag, member["name"], member, None))
+    return events
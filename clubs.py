@@ -0,0 +1,84 @@
+import os
+
+from config import config
+from helpers import CLUB_TAG
+from store import StateStore, state, DB_FILE
+
+# ------------------ Tracked Clubs ------------------ #
+# data.json may list several clubs under "Clubs"; each gets its own channels
+# and its own state store, so the trackers of one club never see (or prune)
+# another club's rows. Without "Clubs" the single-club keys ("Club",
+# "ClubStatChannel", ...) are used and nothing changes for existing setups.
+#
+#   "Clubs": [
+#       {"tag": "#2QY8P", "name": "Main", "TrackingChannel": 123, "JoinLeaveChannel": 456, "ClubStatChannel": 789},
+#       {"tag": "#8LJ0V", "name": "Feeder", "TrackingChannel": 321, "JoinLeaveChannel": 654, "ClubStatChannel": 987}
+#   ]
+#
+# The first club keeps state.db (and the bot-wide flags in it); every other
+# club gets state-<TAG>.db next to it.
+
+# Channels used when a club entry (or the single-club config) does not set them
+DEFAULT_TRACKING_CHANNEL_ID = int(config.get("GLOBAL_TRACKING_CHANNEL_ID", 1444110135386705953))
+DEFAULT_JOIN_LEAVE_CHANNEL_ID = int(config.get("JOIN_LEAVE_CHANNEL_ID", 1434373001285210124))
+DEFAULT_STATS_CHANNEL_ID = int(config.get("ClubStatChannel", 0))
+
+def normalize_tag(tag: str) -> str:
+    return "#" + tag.replace("#", "").strip().upper()
+
+def _state_path(key: str) -> str:
+    root, ext = os.path.splitext(DB_FILE)
+    return f"{root}-{key}{ext or '.db'}"
+
+class Club:
+    def __init__(self, tag: str, name: str = None, tracking_channel_id: int = DEFAULT_TRACKING_CHANNEL_ID,
+                 join_leave_channel_id: int = DEFAULT_JOIN_LEAVE_CHANNEL_ID,
+                 stats_channel_id: int = DEFAULT_STATS_CHANNEL_ID, store: StateStore = None):
+        self.tag = normalize_tag(tag)   # "#2QY8P"
+        self.key = self.tag[1:]         # "2QY8P": state namespace and scheduler group
+        self.name = name or self.tag
+        self.tracking_channel_id = tracking_channel_id
+        self.join_leave_channel_id = join_leave_channel_id
+        self.stats_channel_id = stats_channel_id
+        self.state = store or StateStore(_state_path(self.key))
+
+    def __repr__(self):
+        return f"Club({self.tag!r}, {self.name!r})"
+
+def load_clubs() -> list:
+    entries = config.get("Clubs")
+    if not entries:
+        return [Club(CLUB_TAG, store=state)]
+
+    clubs = []
+    for i, entry in enumerate(entries):
+        if not entry.get("tag"):
+            raise ValueError(f"❌ Clubs[{i}] in data.json has no tag")
+        clubs.append(Club(
+            entry["tag"],
+            name=entry.get("name"),
+            tracking_channel_id=int(entry.get("TrackingChannel", DEFAULT_TRACKING_CHANNEL_ID)),
+            join_leave_channel_id=int(entry.get("JoinLeaveChannel", DEFAULT_JOIN_LEAVE_CHANNEL_ID)),
+            stats_channel_id=int(entry.get("ClubStatChannel", DEFAULT_STATS_CHANNEL_ID)),
+            store=state if i == 0 else None,
+        ))
+    if len({c.key for c in clubs}) != len(clubs):
+        raise ValueError("❌ Duplicate club tag in data.json Clubs")
+    return clubs
+
+CLUBS = load_clubs()
+
+def find_club(query: str = None) -> Club:
+    """Club by tag or name (case-insensitive); the first club when `query` is empty. None if unknown."""
+    if not query:
+        return CLUBS[0]
+    query = query.strip()
+    for club in CLUBS:
+        if club.key == query.replace("#", "").upper() or club.name.lower() == query.lower():
+            return club
+    return None
+
+async def flush_all():
+    """Writes every club's pending state. Call on shutdown."""
+    for club in CLUBS:
+        await club.state.flush()
@@ -0,0 +1,140 @@
+import json
+
+# ------------------ Configuration ------------------ #
+# data.json is read and checked once, here, and every module takes its
+# settings from `config` (still read with config.get(KEY, default) next to
+# the code that uses them). Everything wrong with the file is reported in one
+# error at start-up rather than as the first KeyError some module hits.
+
+CONFIG_FILE = "data.json"
+
+# Numeric options and the type each is read as. Values may be written as
+# JSON numbers or numeric strings; load_config converts them to this type.
+NUMERIC_OPTIONS = {
+    # Brawl Stars API pacing and HTTP client (helpers.py)
+    "API_RATE_PER_SEC": float,
+    "API_BURST": int,
+    "API_WORKERS": int,
+    "GLOBAL_RANKING_DEPTH": int,
+    "BRAWLER_CATALOG_TTL": float,
+    "HTTP_CACHE_MAX_ENTRIES": int,
+    "HTTP_TIMEOUT": float,
+    "HTTP_CONNECT_TIMEOUT": float,
+    "HTTP_POOL_SIZE": int,
+    "HTTP_LIMIT_PER_HOST": int,
+    "HTTP_DNS_TTL": int,
+    "HTTP_KEEPALIVE": float,
+    "RETRY_MAX_ATTEMPTS": int,
+    "RETRY_BASE_DELAY": float,
+    "RETRY_MAX_DELAY": float,
+    "RETRY_BUDGET_RATIO": float,
+    "BREAKER_FAILURES": int,
+    "BREAKER_RESET_SECONDS": float,
+    # brawltools client and caches (brawltools.py)
+    "BRAWLTOOLS_TIMEOUT": float,
+    "BRAWLTOOLS_IMAGE_TIMEOUT": float,
+    "PROFILE_CACHE_TTL": float,
+    "PROFILE_CACHE_STALE": float,
+    "PROFILE_CACHE_MAX_ENTRIES": int,
+    "PROFILE_CACHE_MAX_BYTES": int,
+    "CLUB_CACHE_TTL": float,
+    "IMAGE_CACHE_TTL": float,
+    "IMAGE_CACHE_MAX_ENTRIES": int,
+    "IMAGE_CACHE_MAX_BYTES": int,
+    "IMAGE_CACHE_MAX_FILES": int,
+    # Club tracking (milestones.py, workers.py)
+    "POLL_SECONDS": float,
+    "POLL_MIN_SECONDS": float,
+    "POLL_MAX_SECONDS": float,
+    "POLL_IDLE_FACTOR": float,
+    "POLL_MEMBERS_PER_PASS": int,
+    "WORKER_PROCESSES": int,
+    "COORDINATOR_API_SHARE": float,
+    "SHUTDOWN_TIMEOUT_SECONDS": float,
+    # Storage (store.py, history.py)
+    "STATE_FLUSH_DELAY": float,
+    "HISTORY_FLUSH_DELAY": float,
+    "HISTORY_RETENTION_DAYS": int,
+    "HISTORY_DOWNSAMPLE_DAYS": int,
+    "HISTORY_DOWNSAMPLE_BUCKET": int,
+    # Bot (bot.py, clubs.py); channel ids and intervals kept under their historical names
+    "UpdateTime": int,
+    "METRICS_PORT": int,
+    "PROFILE_EMBED_CACHE_SIZE": int,
+    "PROFILE_EMBED_CACHE_MAX_BYTES": int,
+    "GLOBAL_LEADERBOARD_ATTEMPTS": int,
+    "ClubStatChannel": int,
+    "GLOBAL_TRACKING_CHANNEL_ID": int,
+    "JOIN_LEAVE_CHANNEL_ID": int,
+}
+# Per-club channel ids in the "Clubs" list
+_CLUB_CHANNELS = ("TrackingChannel", "JoinLeaveChannel", "ClubStatChannel")
+
+def _convert(kind, value):
+    """`value` as `kind` (int or float); raises ValueError if it is not one."""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError
+    if kind is int:
+        if isinstance(value, float) and not value.is_integer():
+            raise ValueError
+        return int(value)   # "8.5" raises too: not a whole number
+    return float(value)
+
+def _check(kind, value) -> bool:
+    try:
+        _convert(kind, value)
+    except ValueError:
+        return False
+    return True
+
+def validate(cfg: dict) -> list:
+    """Returns every problem found in `cfg` (empty when it is usable)."""
+    problems = []
+    for key in ("token", "BrawlStarsAPITOKEN"):
+        if not cfg.get(key):
+            problems.append(f"missing {key}")
+
+    clubs = cfg.get("Clubs")
+    if clubs is not None:
+        if not isinstance(clubs, list) or not all(isinstance(c, dict) for c in clubs):
+            problems.append("Clubs must be a list of objects")
+        else:
+            for i, club in enumerate(clubs):
+                if not club.get("tag"):
+                    problems.append(f"Clubs[{i}] has no tag")
+                for key in _CLUB_CHANNELS:
+                    if key in club and not _check(int, club[key]):
+                        problems.append(f"Clubs[{i}].{key} must be a channel id, got {club[key]!r}")
+    if not cfg.get("Club") and not clubs:
+        problems.append("missing Club tag (or a Clubs list)")
+
+    for key, kind in NUMERIC_OPTIONS.items():
+        if key in cfg and not _check(kind, cfg[key]):
+            expected = "a whole number" if kind is int else "a number"
+            problems.append(f"{key} must be {expected}, got {cfg[key]!r}")
+    return problems
+
+def load_config(path: str = CONFIG_FILE) -> dict:
+    try:
+        with open(path, "r") as f:
+            cfg = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        raise ValueError(f"❌ Missing or invalid {path}: {e}") from e
+    if not isinstance(cfg, dict):
+        raise ValueError(f"❌ {path} must hold a JSON object")
+
+    problems = validate(cfg)
+    if problems:
+        raise ValueError(f"❌ Invalid {path}:\n  - " + "\n  - ".join(problems))
+
+    # Modules read options with config.get(KEY, default) and use them as-is
+    for key, kind in NUMERIC_OPTIONS.items():
+        if key in cfg:
+            cfg[key] = _convert(kind, cfg[key])
+    for club in cfg.get("Clubs") or []:
+        for key in _CLUB_CHANNELS:
+            if key in club:
+                club[key] = _convert(int, club[key])
+    return cfg
+
+config = load_config()
@@ -0,0 +1,91 @@
+from info import upgrade_costs, COINS_PER_STARPOWER, COINS_PER_GADGET
+from catalog import catalog
+
+# ------------------ Cost To Max ------------------ #
+# Remaining coins / power points to max an account. The per-power upgrade
+# cost is precomputed as a suffix sum over upgrade_costs, so one brawler is a
+# table lookup instead of a walk over every upgrade step, and a whole club is
+# one gather + bincount over all brawlers of all members.
+
+MAX_POWER = max(u["to"] for u in upgrade_costs)
+
+# COINS_TO_MAX[p] / PP_TO_MAX[p]: cost of every upgrade step a brawler at power p still needs
+COINS_TO_MAX = [sum(u["coins"] for u in upgrade_costs if p <= u["from"]) for p in range(MAX_POWER + 1)]
+PP_TO_MAX = [sum(u["power_points"] for u in upgrade_costs if p <= u["from"]) for p in range(MAX_POWER + 1)]
+
+# A brawler not yet unlocked still needs the full level 1 -> MAX_POWER journey
+FULL_COINS = COINS_TO_MAX[1]
+FULL_PP = PP_TO_MAX[1]
+
+# NumPy is optional (the pure-Python path gives the same numbers) and only
+# imported on the first club-wide calculation, so start-up does not pay for it
+_np = None      # the numpy module once imported, False if not installed
+
+def _numpy():
+    global _np, _COINS, _PP
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:
+            _np = False
+        else:
+            _COINS = numpy.array(COINS_TO_MAX, dtype=numpy.int64)
+            _PP = numpy.array(PP_TO_MAX, dtype=numpy.int64)
+            _np = numpy
+    return _np or None
+
+def _power(b) -> int:
+    return min(max(b.get("power", 1), 0), MAX_POWER)
+
+def _account_totals(owned: int, coins: int, pp: int, star_powers: int, gadgets: int):
+    """Adds unowned brawlers and missing Star Powers / Gadgets to the owned-brawler upgrade cost."""
+    unowned = catalog.count - owned
+    if unowned > 0:
+        coins += FULL_COINS * unowned
+        pp += FULL_PP * unowned
+    coins += (catalog.star_powers_total - star_powers) * COINS_PER_STARPOWER
+    coins += (catalog.gadgets_total - gadgets) * COINS_PER_GADGET
+    return coins, pp, star_powers, gadgets
+
+def cost_to_max(owned_brawlers: list):
+    """
+    Returns (coins, power_points, star_powers_owned, gadgets_owned) still
+    needed to max every brawler in the catalog, for one player.
+    """
+    coins = pp = star_powers = gadgets = 0
+    for b in owned_brawlers:
+        p = _power(b)
+        coins += COINS_TO_MAX[p]
+        pp += PP_TO_MAX[p]
+        star_powers += len(b.get("starPowers", []))
+        gadgets += len(b.get("gadgets", []))
+    return _account_totals(len(owned_brawlers), coins, pp, star_powers, gadgets)
+
+def club_cost_to_max(rosters: list) -> list:
+    """
+    cost_to_max for many players at once; `rosters` is one brawler list per
+    player. Vectorized over every brawler of every player when NumPy is installed.
+    """
+    np = _numpy() if rosters else None
+    if np is None:
+        return [cost_to_max(r) for r in rosters]
+
+    # One pass over the JSON to pull out the three numbers per brawler; the
+    # arithmetic after that is whole-array
+    counts = np.fromiter((len(r) for r in rosters), dtype=np.int64, count=len(rosters))
+    flat = [(b.get("power", 1), len(b.get("starPowers", ())), len(b.get("gadgets", ()))) for r in rosters for b in r]
+    columns = np.array(flat, dtype=np.int64).reshape(-1, 3)
+    powers = np.clip(columns[:, 0], 0, MAX_POWER)
+    star_powers, gadgets = columns[:, 1], columns[:, 2]
+    owner = np.repeat(np.arange(len(rosters)), counts)
+
+    n = len(rosters)
+    coins = np.bincount(owner, weights=_COINS[powers], minlength=n)
+    pp = np.bincount(owner, weights=_PP[powers], minlength=n)
+    sp_owned = np.bincount(owner, weights=star_powers, minlength=n)
+    gadgets_owned = np.bincount(owner, weights=gadgets, minlength=n)
+
+    return [
+        _account_totals(int(counts[i]), int(coins[i]), int(pp[i]), int(sp_owned[i]), int(gadgets_owned[i]))
+        for i in range(n)
+    ]
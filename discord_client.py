@@ -0,0 +1,13 @@
+import discord
+from discord import app_commands
+
+# ------------------ Discord Client ------------------ #
+# The one gateway connection for the whole bot. Slash commands (bot.py) and
+# the milestone trackers (milestones.py) both use this client and tree, so
+# there is a single websocket, heartbeat, member cache and command tree.
+
+intents = discord.Intents.default()
+# Intents are required for member-related events, which is critical for club tracking
+intents.members = True
+client = discord.Client(intents=intents)
+tree = app_commands.CommandTree(client)
@@ -1,23 +1,61 @@
 import json
+import time
+import asyncio
+import hashlib
 import aiohttp
+from collections import OrderedDict
 
-# ------------------ Load config from data.json ------------------ #
+from config import config
+from singleflight import SingleFlight
+import metrics
+from resilience import (
+    HostPolicy,
+    CircuitBreaker,
+    RetryBudget,
+    RetryableError,
+    CircuitOpenError,
+    parse_retry_after,
+)
 
-with open("data.json", "r") as f:
-    config = json.load(f)
+# ------------------ Config ------------------ #
+# Loaded and validated once in config.py
 
 BRAWL_API_KEY = config.get("BrawlStarsAPITOKEN")
-CLUB_TAG = config.get("Club")
-
-if not BRAWL_API_KEY:
-    raise ValueError("❌ Missing BrawlStarsAPITOKEN in data.json")
-if not CLUB_TAG:
-    raise ValueError("❌ Missing Club tag in data.json")
+# The single tracked club, or the first entry of "Clubs" (see clubs.py)
+CLUB_TAG = config.get("Club") or config["Clubs"][0]["tag"]
 
 # Ensure club tag starts with #
 if not CLUB_TAG.startswith("#"):
     CLUB_TAG = f"#{CLUB_TAG}"
 
+# HTTP client tuning (all optional in data.json)
+HTTP_TIMEOUT = float(config.get("HTTP_TIMEOUT", 15))
+HTTP_CONNECT_TIMEOUT = float(config.get("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_POOL_SIZE = int(config.get("HTTP_POOL_SIZE", 100))
+HTTP_LIMIT_PER_HOST = int(config.get("HTTP_LIMIT_PER_HOST", 20))
+HTTP_KEEPALIVE = float(config.get("HTTP_KEEPALIVE", 60))
+HTTP_DNS_TTL = int(config.get("HTTP_DNS_TTL", 300))
+
+# Poll fan-out: concurrent member fetches and the API request rate they share
+API_WORKERS = int(config.get("API_WORKERS", 8))
+API_RATE_PER_SEC = float(config.get("API_RATE_PER_SEC", 10))
+API_BURST = int(config.get("API_BURST", API_WORKERS))
+
+# Global brawler leaderboard job
+BRAWLER_CATALOG_TTL = float(config.get("BRAWLER_CATALOG_TTL", 86400))
+GLOBAL_RANKING_DEPTH = int(config.get("GLOBAL_RANKING_DEPTH", 200))
+
+# Retries, backoff and circuit breaking for api.brawlstars.com / api.brawltools.net
+RETRY_MAX_ATTEMPTS = int(config.get("RETRY_MAX_ATTEMPTS", 3))
+RETRY_BASE_DELAY = float(config.get("RETRY_BASE_DELAY", 0.5))
+RETRY_MAX_DELAY = float(config.get("RETRY_MAX_DELAY", 10))
+RETRY_BUDGET_RATIO = float(config.get("RETRY_BUDGET_RATIO", 0.2))
+BREAKER_FAILURES = int(config.get("BREAKER_FAILURES", 5))
+BREAKER_RESET_SECONDS = float(config.get("BREAKER_RESET_SECONDS", 30))
+
+# Responses kept for Cache-Control / ETag revalidation
+HTTP_CACHE_MAX_ENTRIES = int(config.get("HTTP_CACHE_MAX_ENTRIES", 4096))
+
 # ------------------ Custom Emojis ------------------ #
 # These must exist in your Discord server
 
@@ -28,29 +66,237 @@ custom_emoji3 = "<:3v3:1434627404273549342>" # 3v3 Wins
 custom_emoji4 = "<:sd:1434627372065489018>"  # Showdown Wins
 custom_emoji5 = "<:pl:1434701133980631060>"  # Power League
 
+# ------------------ Shared HTTP Session ------------------ #
+# One pooled session for the whole process: keep-alive connections,
+# per-host limits and a DNS cache are reused across every poll cycle.
+
+_session = None
+
+def get_session():
+    """
+    Returns the shared aiohttp session, creating it on first use.
+    Must be called from inside the running event loop.
+    """
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_SIZE,
+            limit_per_host=HTTP_LIMIT_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_TTL,
+            keepalive_timeout=HTTP_KEEPALIVE,
+        )
+        timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+        _session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return _session
+
+async def close_session():
+    """
+    Closes the shared session. Call once on shutdown.
+    """
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+# ------------------ Rate Limiting ------------------ #
+
+class TokenBucket:
+    """
+    Async token bucket. `rate` tokens are added per second up to `capacity`;
+    acquire() waits until a token is available.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+api_limiter = TokenBucket(API_RATE_PER_SEC, API_BURST)
+
+async def gather_limited(items, fetch, workers: int = API_WORKERS):
+    """
+    Runs `await fetch(item)` for every item with at most `workers` in flight.
+    Returns the results in the same order as `items`.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < len(items):
+            i = next_index
+            next_index += 1
+            results[i] = await fetch(items[i])
+
+    await asyncio.gather(*(worker() for _ in range(min(workers, len(items)))))
+    return results
+
+# ------------------ Resilience ------------------ #
+
+# One budget for every host, so retries can never amplify total load
+retry_budget = RetryBudget(ratio=RETRY_BUDGET_RATIO)
+
+def make_host_policy(host: str) -> HostPolicy:
+    return HostPolicy(
+        host,
+        retry_budget,
+        max_attempts=RETRY_MAX_ATTEMPTS,
+        base_delay=RETRY_BASE_DELAY,
+        max_delay=RETRY_MAX_DELAY,
+        breaker=CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET_SECONDS),
+    )
+
 # ------------------ API Base ------------------ #
 
-BASE_URL = "https://api.brawlstars.com/v1/"
+# Overridable so the bench harness (bench/) can point the bot at a local mock
+BASE_URL = config.get("BRAWL_API_BASE_URL", "https://api.brawlstars.com/v1/")
+
+# Identical concurrent requests share one upstream call
+inflight = SingleFlight()
+api_policy = make_host_policy("api.brawlstars.com")
+
+def _collect_resilience_metrics(registry):
+    # Retries and an empty budget are the first signs that upstream limits are near
+    registry.set("upstream_retries", api_policy.retries, host=api_policy.host)
+    registry.set("singleflight_shared", inflight.shared, host=api_policy.host)
+    registry.set("retry_budget_tokens", retry_budget.tokens)
+    registry.set("retry_budget_exhausted", retry_budget.exhausted)
+
+metrics.registry.register_collector(_collect_resilience_metrics)
+
+# url -> {"data", "etag", "last_modified", "digest", "expires"}
+_http_cache = OrderedDict()
+
+def _max_age(headers) -> float:
+    """Seconds the response may be reused for, from Cache-Control and Age."""
+    directives = [d.strip().lower() for d in headers.get("Cache-Control", "").split(",")]
+    if "no-store" in directives or "no-cache" in directives:
+        return 0
+    for d in directives:
+        if d.startswith("max-age="):
+            try:
+                age = int(d[len("max-age="):])
+            except ValueError:
+                return 0
+            try:
+                age -= int(headers.get("Age", 0))
+            except ValueError:
+                pass
+            return max(0, age)
+    return 0
+
+def _remember(url: str, entry: dict):
+    _http_cache[url] = entry
+    _http_cache.move_to_end(url)
+    while len(_http_cache) > HTTP_CACHE_MAX_ENTRIES:
+        _http_cache.popitem(last=False)
 
 async def fetch_api(path: str):
     """
     Fetches data from Brawl Stars API.
     Returns dict on success, None on failure.
+    Concurrent calls for the same path share one request and its result.
+    The returned dict may be shared with other callers: do not mutate it.
+    """
+    data, _ = await fetch_api_versioned(path)
+    return data
+
+async def fetch_api_versioned(path: str):
+    """
+    Like fetch_api, but returns (data, digest). `digest` identifies the
+    response body (None on failure): a caller that remembers the digest it
+    last applied can skip re-diffing when it is the same. Fresh cache hits
+    and 304s return the digest of the cached body.
     """
     url = f"{BASE_URL}{path}"
-    headers = {"Authorization": f"Bearer {BRAWL_API_KEY}"}
+    entry = _http_cache.get(url)
+    if entry and entry["expires"] > time.monotonic():
+        _http_cache.move_to_end(url)
+        metrics.inc("http_cache_fresh_hits_total", host="api.brawlstars.com")
+        return entry["data"], entry["digest"]
+    return await inflight.do(url, lambda: _fetch_api(url))
 
+async def _fetch_api(url: str):
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as resp:
-                if resp.status != 200:
-                    text = await resp.text()
-                    print(f"⚠️ API request failed: {resp.status} {text}")
-                    return None
-                return await resp.json()
+        return await api_policy.run(lambda: _fetch_api_once(url))
+    except RetryableError as e:
+        print(f"⚠️ API request failed after retries: {e}")
+    except CircuitOpenError as e:
+        print(f"⚠️ API request skipped: {e}")
     except Exception as e:
         print(f"⚠️ API request exception: {e}")
-        return None
+    return None, None
+
+async def _fetch_api_once(url: str):
+    """
+    One attempt. Raises RetryableError on 429, 5xx, timeouts and connection
+    errors; other failures return (None, None).
+    """
+    headers = {"Authorization": f"Bearer {BRAWL_API_KEY}"}
+    entry = _http_cache.get(url)
+    if entry:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    await api_limiter.acquire()
+    session = get_session()
+    start = time.perf_counter()
+    status = "error"
+    try:
+        async with session.get(url, headers=headers) as resp:
+            status = resp.status
+            if resp.status == 304 and entry:
+                entry["expires"] = time.monotonic() + _max_age(resp.headers)
+                _remember(url, entry)
+                return entry["data"], entry["digest"]
+            if resp.status == 429:
+                raise RetryableError(
+                    "429 rate limited",
+                    retry_after=parse_retry_after(resp.headers.get("Retry-After")),
+                    trips_breaker=False,
+                )
+            if resp.status >= 500:
+                raise RetryableError(f"{resp.status} {await resp.text()}")
+            if resp.status != 200:
+                text = await resp.text()
+                print(f"⚠️ API request failed: {resp.status} {text}")
+                return None, None
+            body = await resp.read()
+
+            # Unchanged body: reuse the parsed data instead of decoding again
+            digest = hashlib.blake2b(body, digest_size=16).digest()
+            data = entry["data"] if entry and entry["digest"] == digest else json.loads(body)
+            _remember(url, {
+                "data": data,
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "digest": digest,
+                "expires": time.monotonic() + _max_age(resp.headers),
+            })
+            return data, digest
+    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+        status = "timeout" if isinstance(e, asyncio.TimeoutError) else "connection_error"
+        raise RetryableError(f"{type(e).__name__}: {e}") from e
+    finally:
+        metrics.record_request("api.brawlstars.com", url[len(BASE_URL):], status, time.perf_counter() - start)
 
 # ------------------ Player Helpers ------------------ #
 
@@ -58,37 +304,51 @@ async def get_player_data(player_tag: str):
     """
     Returns player data dict, or None if failed.
     """
+    data, _ = await get_player_data_versioned(player_tag)
+    return data
+
+async def get_player_data_versioned(player_tag: str):
+    """
+    Returns (player data dict or None, body digest or None); see fetch_api_versioned.
+    """
     if not player_tag:
-        return None
+        return None, None
     tag = player_tag.replace("#", "%23")
-    return await fetch_api(f"players/{tag}")
+    return await fetch_api_versioned(f"players/{tag}")
 
 async def get_player_battlelog(player_tag: str):
     """
     Returns list of battle log entries, empty list if failed.
     """
+    items, _ = await get_player_battlelog_versioned(player_tag)
+    return items
+
+async def get_player_battlelog_versioned(player_tag: str):
+    """
+    Returns (battle log entries, body digest or None); see fetch_api_versioned.
+    """
     if not player_tag:
-        return []
+        return [], None
     tag = player_tag.replace("#", "%23")
-    data = await fetch_api(f"players/{tag}/battlelog")
+    data, digest = await fetch_api_versioned(f"players/{tag}/battlelog")
     if not data:
-        return []
-    return data.get("items", [])
+        return [], None
+    return data.get("items", []), digest
 
 # ------------------ Club Helpers ------------------ #
 
-async def get_club_members():
+async def get_club_members(club_tag: str = CLUB_TAG):
     """
     Returns list of club members dicts, empty list if failed.
     """
-    if not CLUB_TAG:
+    if not club_tag:
         print("⚠️ Club tag missing in data.json")
         return []
 
-    tag = CLUB_TAG.replace("#", "%23")
+    tag = "%23" + club_tag.replace("#", "")
     data = await fetch_api(f"clubs/{tag}/members")
     if not data:
-        print("⚠️ Failed to fetch club members")
+        print(f"⚠️ Failed to fetch club members for {club_tag}")
         return []
 
     members = data.get("items", [])
@@ -96,3 +356,16 @@ async def get_club_members():
         return []
 
     return members
+
+# ------------------ Global Rankings ------------------ #
+
+async def get_brawler_ranking(brawler_id, limit: int = GLOBAL_RANKING_DEPTH):
+    """
+    Returns the top `limit` global players for one brawler, or None if it
+    failed. Transient failures are retried by fetch_api's host policy.
+    """
+    data = await fetch_api(f"rankings/global/brawlers/{brawler_id}?limit={limit}")
+    if data is None:
+        print(f"⚠️ Giving up on global ranking for brawler {brawler_id}")
+        return None
+    return data.get("items", [])
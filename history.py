@@ -0,0 +1,250 @@
+import time
+import sqlite3
+import threading
+
+from config import config
+from persist import WriteBehind
+
+# ------------------ Trophy / Rank History ------------------ #
+# Append-only time series of per-member, per-brawler trophies plus total
+# trophies and ranked tier. Only changes are stored: a row means "from this
+# timestamp on the value was X", so the value at any time is the latest row
+# at or before it. Tags and series names are interned to integer ids and
+# rows are clustered by (tag, series, ts), so every lookup is an index seek.
+
+HISTORY_DB = config.get("HISTORY_DB", "history.db")
+HISTORY_FLUSH_DELAY = float(config.get("HISTORY_FLUSH_DELAY", 5))
+# Drop samples older than this (the last value before the cutoff is kept)
+HISTORY_RETENTION_DAYS = int(config.get("HISTORY_RETENTION_DAYS", 365))
+# Samples older than this are thinned to one per HISTORY_DOWNSAMPLE_BUCKET seconds
+HISTORY_DOWNSAMPLE_DAYS = int(config.get("HISTORY_DOWNSAMPLE_DAYS", 14))
+HISTORY_DOWNSAMPLE_BUCKET = int(config.get("HISTORY_DOWNSAMPLE_BUCKET", 86400))
+
+# Reserved series names next to the brawler names
+TOTAL = "_total"
+RANKED = "_ranked"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tags (
+    id  INTEGER PRIMARY KEY,
+    tag TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS series (
+    id   INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS samples (
+    tag_id    INTEGER NOT NULL,
+    series_id INTEGER NOT NULL,
+    ts        INTEGER NOT NULL,
+    value     INTEGER NOT NULL,
+    PRIMARY KEY (tag_id, series_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+def normalize_tag(tag: str) -> str:
+    return "#" + tag.replace("#", "").strip().upper()
+
+class History:
+    def __init__(self, path: str = HISTORY_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+        # Queries use their own connection: in WAL mode it reads the last
+        # committed data while a flush or compaction holds the writer, so
+        # /history never waits behind _db_lock on the event loop
+        self.reader = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.reader.execute("PRAGMA query_only=ON")
+
+        self._db_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.writer = WriteBehind(self._flush, delay=HISTORY_FLUSH_DELAY, name="history")
+
+        self._tag_ids = dict(self.conn.execute("SELECT tag, id FROM tags"))
+        self._series_ids = dict(self.conn.execute("SELECT name, id FROM series"))
+
+        # Latest known value per (tag_id, series_id), used to skip unchanged samples
+        self._last = {
+            (tag_id, series_id): value
+            for tag_id, series_id, value in self.conn.execute(
+                "SELECT s.tag_id, s.series_id, s.value FROM samples s "
+                "JOIN (SELECT tag_id, series_id, MAX(ts) AS ts FROM samples GROUP BY tag_id, series_id) m "
+                "USING (tag_id, series_id, ts)"
+            )
+        }
+        self._pending = []   # (tag_id, series_id, ts, value)
+        self._new_ids = []   # ("tags" | "series", id, name) not yet written
+
+    async def flush(self):
+        await self.writer.flush()
+
+    # ----------------- Ids ----------------- #
+
+    def _intern(self, table: str, ids: dict, name: str) -> int:
+        id_ = ids.get(name)
+        if id_ is None:
+            id_ = len(ids) + 1
+            ids[name] = id_
+            self._new_ids.append((table, id_, name))
+        return id_
+
+    def _tag_id(self, tag: str) -> int:
+        return self._intern("tags", self._tag_ids, normalize_tag(tag))
+
+    def _series_id(self, name: str) -> int:
+        return self._intern("series", self._series_ids, name)
+
+    # ----------------- Recording ----------------- #
+
+    def record(self, tag: str, values: dict, ts: int = None):
+        """
+        Records {series: value} for a member at `ts` (default now).
+        Values equal to the last recorded one are skipped.
+        """
+        ts = int(ts if ts is not None else time.time())
+        rows = []
+        with self._lock:
+            tag_id = self._tag_id(tag)
+            for name, value in values.items():
+                if value is None:
+                    continue
+                key = (tag_id, self._series_id(name))
+                if self._last.get(key) == value:
+                    continue
+                self._last[key] = value
+                rows.append((tag_id, key[1], ts, int(value)))
+            self._pending.extend(rows)
+        if rows:
+            self.writer.mark_dirty()
+
+    def _flush(self):
+        """Runs in a worker thread."""
+        with self._lock:
+            rows, self._pending = self._pending, []
+            new_ids, self._new_ids = self._new_ids, []
+        with self._db_lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                for table, id_, name in new_ids:
+                    column = "tag" if table == "tags" else "name"
+                    self.conn.execute(f"INSERT OR IGNORE INTO {table} (id, {column}) VALUES (?, ?)", (id_, name))
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO samples (tag_id, series_id, ts, value) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+            self._maybe_compact()
+
+    # ----------------- Retention ----------------- #
+
+    def _maybe_compact(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'last_compact'").fetchone()
+        now = int(time.time())
+        if row and now - row[0] < 86400:
+            return
+        self.compact(now)
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('last_compact', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (now,),
+        )
+
+    def compact(self, now: int = None):
+        """
+        Applies retention and downsampling. Call with _db_lock held.
+        The value at every kept timestamp and bucket boundary is preserved.
+        """
+        now = int(now if now is not None else time.time())
+        retention_cutoff = now - HISTORY_RETENTION_DAYS * 86400
+        downsample_cutoff = now - HISTORY_DOWNSAMPLE_DAYS * 86400
+        bucket = HISTORY_DOWNSAMPLE_BUCKET
+
+        with self.conn:
+            self.conn.execute("BEGIN")
+            # Keep only the last sample per bucket in the downsampled range
+            self.conn.execute(
+                "DELETE FROM samples WHERE ts < ? AND EXISTS ("
+                "  SELECT 1 FROM samples later"
+                "  WHERE later.tag_id = samples.tag_id AND later.series_id = samples.series_id"
+                "  AND later.ts > samples.ts AND later.ts < ? AND later.ts / ? = samples.ts / ?)",
+                (downsample_cutoff, downsample_cutoff, bucket, bucket),
+            )
+            # Drop expired samples, keeping the latest one before the cutoff as a baseline
+            self.conn.execute(
+                "DELETE FROM samples WHERE ts < ? AND EXISTS ("
+                "  SELECT 1 FROM samples later"
+                "  WHERE later.tag_id = samples.tag_id AND later.series_id = samples.series_id"
+                "  AND later.ts > samples.ts AND later.ts <= ?)",
+                (retention_cutoff, retention_cutoff),
+            )
+
+    # ----------------- Queries ----------------- #
+
+    def value_at(self, tag: str, series: str, ts: int):
+        """Returns the series value at `ts`, or None if nothing was recorded by then."""
+        tag_id = self._tag_ids.get(normalize_tag(tag))
+        series_id = self._series_ids.get(series)
+        if tag_id is None or series_id is None:
+            return None
+        row = self.reader.execute(
+            "SELECT value FROM samples WHERE tag_id = ? AND series_id = ? AND ts <= ? "
+            "ORDER BY ts DESC LIMIT 1",
+            (tag_id, series_id, int(ts)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def change(self, tag: str, series: str, start: int, end: int = None):
+        """
+        Returns how much a series changed between `start` and `end` (default now).
+        If the member has no sample before `start`, their first sample is the baseline.
+        """
+        end = int(end if end is not None else time.time())
+        last = self.value_at(tag, series, end)
+        if last is None:
+            return None
+        first = self.value_at(tag, series, start)
+        if first is None:
+            first = self._first_value(tag, series)
+        return last - first
+
+    def _first_value(self, tag: str, series: str):
+        row = self.reader.execute(
+            "SELECT value FROM samples WHERE tag_id = ? AND series_id = ? ORDER BY ts LIMIT 1",
+            (self._tag_ids[normalize_tag(tag)], self._series_ids[series]),
+        ).fetchone()
+        return row[0] if row else None
+
+    def brawler_changes(self, tag: str, start: int, end: int = None) -> dict:
+        """Returns {brawler: change} for every brawler that moved in the window."""
+        changes = {}
+        for name in self._series_ids:
+            if name in (TOTAL, RANKED):
+                continue
+            delta = self.change(tag, name, start, end)
+            if delta:
+                changes[name] = delta
+        return changes
+
+    def leaderboard(self, series: str, start: int, end: int = None, tags=None) -> list:
+        """
+        Returns [(tag, change)] sorted by change (descending) over the window.
+        `tags` limits the board to those members (e.g. the current club).
+        """
+        candidates = self._tag_ids if tags is None else [normalize_tag(t) for t in tags]
+        board = []
+        for tag in candidates:
+            if tag not in self._tag_ids:
+                continue
+            delta = self.change(tag, series, start, end)
+            if delta is not None:
+                board.append((tag, delta))
+        board.sort(key=lambda x: x[1], reverse=True)
+        return board
+
+history = History()
@@ -103,8 +103,6 @@ brawlers_with_emojiid = [
     {"id": 16000101, "name": "GLOWBERT", "emojiid": "1455110260439384214"},
 ]
 
-Brawlers = 98
-
 upgrade_costs = [
     {"from": 1, "to": 2, "power_points": 20, "coins": 20},
     {"from": 2, "to": 3, "power_points": 30, "coins": 35},
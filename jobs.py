@@ -0,0 +1,91 @@
+import time
+import asyncio
+
+import metrics
+
+# ------------------ Background Jobs ------------------ #
+# Every background task (club tracking, join/leave checks, daily posts,
+# catalog refresh, ...) is a job on this scheduler instead of a loose
+# create_task. Jobs start once, after the client is ready, however often the
+# gateway reconnects; a crashed job is logged and restarted; stop() cancels
+# them all on shutdown.
+#
+#   jobs.add("club_changes", poll_club_changes, every=UPDATE_TIME)   # periodic
+#   jobs.add("milestones", poll_for_changes)                         # runs until stopped
+
+# Seconds before a crashed long-running job is started again
+RESTART_DELAY = 30
+
+class Job:
+    def __init__(self, name: str, fn, every: float = None):
+        self.name = name
+        self.fn = fn
+        self.every = every      # None: fn runs until stopped
+        self.task = None
+        self.runs = 0
+        self.failures = 0
+        self.last_error = None
+
+    @property
+    def state(self) -> str:
+        if self.task is None:
+            return "idle"
+        return "done" if self.task.done() else "running"
+
+class JobScheduler:
+    def __init__(self):
+        self.jobs = {}   # name -> Job
+        self._started = False
+
+    def add(self, name: str, fn, every: float = None) -> Job:
+        """Registers `fn` (an async callable); with `every`, it runs again `every` seconds after each run."""
+        if name in self.jobs:
+            raise ValueError(f"❌ Job {name} is already registered")
+        job = Job(name, fn, every)
+        self.jobs[name] = job
+        if self._started:
+            job.task = asyncio.create_task(self._run(job, None))
+        return job
+
+    def start(self, client=None):
+        """Starts every job (once); with `client`, each waits for it to be ready first."""
+        if self._started:
+            return
+        self._started = True
+        for job in self.jobs.values():
+            job.task = asyncio.create_task(self._run(job, client), name=f"job-{job.name}")
+
+    async def _run(self, job: Job, client):
+        if client is not None:
+            await client.wait_until_ready()
+        while True:
+            start = time.perf_counter()
+            try:
+                await job.fn()
+                job.runs += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.failures += 1
+                job.last_error = repr(e)
+                metrics.inc("job_failures_total", job=job.name)
+                print(f"⚠️ Job {job.name} failed: {e}")
+                if job.every is None:
+                    await asyncio.sleep(RESTART_DELAY)
+                    continue
+            else:
+                if job.every is None:
+                    return
+            finally:
+                if job.every is not None:
+                    metrics.observe("job_run_seconds", time.perf_counter() - start, job=job.name)
+            await asyncio.sleep(job.every)
+
+    async def stop(self):
+        """Cancels every job and waits for them to unwind."""
+        tasks = [job.task for job in self.jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+jobs = JobScheduler()
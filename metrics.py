@@ -0,0 +1,173 @@
+import re
+import time
+import asyncio
+from bisect import bisect_left
+
+# ------------------ Metrics ------------------ #
+# In-process counters and latency histograms. Rendered as Prometheus text on
+# a localhost-only endpoint and summarised by the /botstats command.
+
+# Seconds; covers fast cache-backed calls up to slow image renders
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound containing the q-quantile (0 if empty)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return self.max
+
+def _escape(value) -> str:
+    """Escapes a Prometheus label value."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Registry:
+    def __init__(self):
+        self.counters = {}     # (name, labels) -> value
+        self.histograms = {}   # (name, labels) -> Histogram
+        self.gauges = {}       # (name, labels) -> value
+        self._collectors = []  # callables run before rendering (set gauges)
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = self._key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, name: str, value: float, **labels):
+        self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = Histogram()
+        hist.observe(value)
+
+    def register_collector(self, fn):
+        self._collectors.append(fn)
+
+    def collect(self):
+        for fn in self._collectors:
+            try:
+                fn(self)
+            except Exception as e:
+                print(f"⚠️ Metrics collector failed: {e}")
+
+    def render_prometheus(self) -> str:
+        self.collect()
+        lines = []
+
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+        for kind, table in (("counter", self.counters), ("gauge", self.gauges)):
+            for name in sorted({n for n, _ in table}):
+                lines.append(f"# TYPE {name} {kind}")
+                for (n, labels), value in table.items():
+                    if n == name:
+                        lines.append(f"{name}{fmt(labels)} {value}")
+
+        for name in sorted({n for n, _ in self.histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (n, labels), hist in self.histograms.items():
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {hist.count}")
+                lines.append(f"{name}_sum{fmt(labels)} {hist.sum}")
+                lines.append(f"{name}_count{fmt(labels)} {hist.count}")
+
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+set_gauge = registry.set
+
+# ------------------ Helpers ------------------ #
+
+_TAG_RE = re.compile(r"(%23|#)[0-9A-Za-z]+")
+_ID_RE = re.compile(r"/\d+(?=/|$)")
+
+def endpoint_label(path: str) -> str:
+    """Collapses tags and ids out of a URL path so label cardinality stays bounded."""
+    path = path.split("?", 1)[0]
+    path = _TAG_RE.sub("{tag}", path)
+    return _ID_RE.sub("/{id}", path)
+
+def record_request(host: str, path: str, status, seconds: float):
+    """One upstream HTTP request: latency histogram plus a per-status counter."""
+    endpoint = endpoint_label(path)
+    observe("upstream_request_seconds", seconds, host=host, endpoint=endpoint)
+    inc("upstream_requests_total", host=host, endpoint=endpoint, status=status)
+
+async def discord_send(destination, *args, **kwargs):
+    """destination.send(...) with its latency and outcome recorded."""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        return await destination.send(*args, **kwargs)
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        observe("discord_send_seconds", time.perf_counter() - start)
+        inc("discord_sends_total", outcome=outcome)
+
+async def monitor_event_loop_lag(interval: float = 1.0):
+    """Measures how late the loop wakes a sleeping task; runs forever."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - start - interval)
+        observe("event_loop_lag_seconds", lag)
+        set_gauge("event_loop_lag_last_seconds", lag)
+
+# ------------------ Prometheus Endpoint ------------------ #
+
+async def start_http_server(port: int, host: str = "127.0.0.1"):
+    """
+    Serves GET /metrics in Prometheus text format. Bound to localhost by
+    default; returns the aiohttp runner so the caller can clean it up.
+    """
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(text=registry.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"📊 Metrics on http://{host}:{port}/metrics")
+    return runner
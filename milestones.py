@@ -1,16 +1,16 @@
 import os
+import time
 import asyncio
-import aiohttp
 from datetime import datetime, timedelta, timezone
-import json
 import discord
-from discord import app_commands
-from discord.ext import tasks
 
 from helpers import (
-    get_player_data,
-    get_player_battlelog,
+    fetch_api,
+    get_player_data_versioned,
+    get_player_battlelog_versioned,
     get_club_members,
+    gather_limited,
+    API_RATE_PER_SEC,
     custom_emoji,
     custom_emoji1,
     custom_emoji2,
@@ -19,78 +19,134 @@ from helpers import (
     custom_emoji5
 )
 
-from info import Ranks2, Boxes
+from catalog import catalog
+from history import history, TOTAL, RANKED
+from scheduler import MemberScheduler, last_battle_time
+from clubs import CLUBS
+from discord_client import client
+from jobs import jobs
+import metrics
+from metrics import discord_send
+from config import config
 
-# Load configuration from data.json
-def load_config():
-    try:
-        with open("data.json", "r") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        raise ValueError("❌ Missing or invalid data.json file")
-
-config = load_config()
-DISCORD_TOKEN = config.get("token")
-BRAWL_API_KEY = config.get("BrawlStarsAPITOKEN")
-CLUB_TAG = config.get("Club")
-CHANNEL_ID = 1444110135386705953
 POLL_SECONDS = config.get("POLL_SECONDS", 180)
-GLOBAL_TRACKING_CHANNEL_ID = config.get("GLOBAL_TRACKING_CHANNEL_ID", 1444110135386705953)
+# Per-member polling bounds: active players are fetched every POLL_MIN_SECONDS,
+# idle ones back off towards POLL_MAX_SECONDS (idle time × POLL_IDLE_FACTOR)
+POLL_MIN_SECONDS = config.get("POLL_MIN_SECONDS", 60)
+POLL_MAX_SECONDS = config.get("POLL_MAX_SECONDS", 1800)
+POLL_IDLE_FACTOR = config.get("POLL_IDLE_FACTOR", 0.25)
+# Members fetched per pass across all clubs (two requests each); by default
+# what the API rate allows in POLL_MIN_SECONDS, shared fairly between clubs
+POLL_MEMBERS_PER_PASS = int(config.get("POLL_MEMBERS_PER_PASS", max(1, API_RATE_PER_SEC * POLL_MIN_SECONDS // 2)))
+# Optional: run the trackers in this many worker processes, sharded by club
+WORKER_PROCESSES = int(config.get("WORKER_PROCESSES", 0))
+# On shutdown, how long the pass in progress may take before it is cancelled
+SHUTDOWN_TIMEOUT_SECONDS = float(config.get("SHUTDOWN_TIMEOUT_SECONDS", 30))
 
-if not all([DISCORD_TOKEN, CLUB_TAG, CHANNEL_ID, BRAWL_API_KEY]):
-    raise ValueError("❌ Missing required configuration in data.json file")
-
-intents = discord.Intents.default()
-intents.message_content = True
-client = discord.Client(intents=intents)
-tree = app_commands.CommandTree(client)
+# ----------------- Utility ----------------- #
+# Milestone state lives in each club's SQLite store (see store.py, clubs.py);
+# data2 keeps the old data2.json dict shape and only changed rows are written back.
+def load_data2(club):
+    return club.state.load_milestones()
 
-DATA_FILE2 = "data2.json"
+def save_data2(club, data2):
+    club.state.save_milestones(data2)
 
-# ----------------- Utility ----------------- #
-def load_data2():
-    try:
-        with open(DATA_FILE2, "r") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {"Ranked": {}, "Trophies": {}, "GlobalTrophyLeader": 0, "LastTrophyBox": {}}
+# ----------------- Event Output ----------------- #
+# Trackers hand finished embeds and history samples to these two functions.
+# In worker mode (workers.py) they are swapped for a queue to this process.
+async def post_embed(channel_id, embed):
+    channel = client.get_channel(channel_id)
+    if channel:
+        await discord_send(channel, embed=embed)
 
-def save_data2(data2):
-    with open(DATA_FILE2, "w") as f:
-        json.dump(data2, f, indent=4)
+def record_samples(tag, values, ts):
+    history.record(tag, values, ts)
 
 # ----------------- Global Trophy Leader ----------------- #
 async def get_global_trophy_leader():
-    BASE_URL = "https://api.brawlstars.com/v1/"
-    headers = {"Authorization": f"Bearer {BRAWL_API_KEY}"}
-    url = f"{BASE_URL}rankings/global/players"
+    rankings_data = await fetch_api("rankings/global/players")
+    if not rankings_data or not rankings_data.get("items"):
+        print("⚠️ Global API request failed")
+        return 0
     
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers) as resp:
-            if resp.status != 200:
-                print(f"⚠️ Global API request failed: {resp.status}")
-                return 0
-            rankings_data = await resp.json()
-            if not rankings_data.get("items"):
-                return 0
-            
-            top_player_tag = rankings_data["items"][0].get("tag")
-            if not top_player_tag:
-                return 0
-            
-            player_data = await get_player_data(top_player_tag)
-            return player_data.get("trophies", 0) if player_data else 0
+    # The rankings entry already carries the player's trophies
+    return rankings_data["items"][0].get("trophies", 0)
+
+# ----------------- Poll Cycle Snapshot ----------------- #
+async def fetch_cycle_snapshot(members, applied=None):
+    """
+    Fetches each member's profile and battlelog exactly once per cycle.
+    Returns {tag: {"profile", "battlelog", "profile_changed", "battlelog_changed", "digests"}}
+    shared by every tracker. The *_changed flags are False only when the body
+    is the one the trackers last applied for that member (`applied`:
+    {tag: (profile digest, battlelog digest)}, kept by the tracker itself).
+    """
+    applied = applied or {}
+
+    async def fetch_member(m):
+        tag = m.get("tag")
+        if not tag:
+            return None
+        (profile, profile_digest), (battle_log, battlelog_digest) = await asyncio.gather(
+            get_player_data_versioned(tag),
+            get_player_battlelog_versioned(tag),
+        )
+        last_profile, last_battlelog = applied.get(tag, (None, None))
+        return {
+            "profile": profile,
+            "battlelog": battle_log,
+            "profile_changed": profile_digest is None or profile_digest != last_profile,
+            "battlelog_changed": battlelog_digest is None or battlelog_digest != last_battlelog,
+            "digests": (profile_digest, battlelog_digest),
+        }
+    
+    results = await gather_limited(members, fetch_member)
+    return {m.get("tag"): r for m, r in zip(members, results) if r is not None}
 
 # ----------------- Ranked Table ----------------- #
-async def update_ranked_table(members):
-    data2 = load_data2()
+# Newest battleTime already processed, per club then member. battleTime
+# strings ("20240101T120000.000Z") sort chronologically, so no parsing is needed.
+battle_cursors = {}
+
+def find_player_slot(battle, tag):
+    """Returns the player entry for `tag` in a battle, or None (stops at the first match)."""
+    for team in battle.get("teams", []):
+        for player in team:
+            if player.get("tag") == tag:
+                return player
+    return None
+
+def latest_ranked_trophies(battle_log, tag, cursor=None):
+    """
+    Returns the member's brawler trophies (rank) in their newest soloRanked
+    battle after `cursor`, or None. The log is newest-first, so parsing stops
+    at the first already-processed battle.
+    """
+    for item in battle_log:
+        battle_time = item.get("battleTime", "")
+        if cursor and battle_time <= cursor:
+            break
+        battle = item.get("battle")
+        if not battle or battle.get("type") != "soloRanked":
+            continue
+        player = find_player_slot(battle, tag)
+        if player is not None:
+            return player.get("brawler", {}).get("trophies", 0)
+    return None
+
+async def update_ranked_table(club, members, snapshot, data2):
     ranked = data2.setdefault("Ranked", {})
+    cursors = battle_cursors.setdefault(club.key, {})
     
     current_tags = {m.get("tag") for m in members if m.get("tag")}
     
     for tag in list(ranked.keys()):
         if tag not in current_tags:
             ranked.pop(tag, None)
+    for tag in list(cursors):
+        if tag not in current_tags:
+            cursors.pop(tag, None)
     
     for m in members:
         tag = m.get("tag")
@@ -98,35 +154,26 @@ async def update_ranked_table(members):
         if not tag:
             continue
         
-        battle_log = await get_player_battlelog(tag)
+        entry = snapshot.get(tag, {})
+        # Nothing new since last cycle and the rank was already applied then
+        if not entry.get("battlelog_changed", True) and tag in ranked:
+            continue
+        
+        battle_log = entry.get("battlelog")
         if not battle_log:
             continue
         
-        trophies = None
-        for entry in battle_log:
-            battle = entry.get("battle")
-            if not battle or battle.get("type") != "soloRanked":
-                continue
-            
-            teams = battle.get("teams", [])
-            if not teams:
-                continue
-            
-            found_trophies = None
-            for team in teams:
-                for player in team:
-                    if player.get("tag") == tag:
-                        found_trophies = player.get("brawler", {}).get("trophies", 0)
-                        break
-                if found_trophies is not None:
-                    break
-            
-            if found_trophies is not None:
-                trophies = found_trophies
-                break
+        # Only battles newer than the last processed one are parsed
+        trophies = latest_ranked_trophies(battle_log, tag, cursors.get(tag))
+        newest = battle_log[0].get("battleTime")
+        if newest:
+            cursors[tag] = max(newest, cursors.get(tag, ""))
         
         if trophies is None:
             continue
+        # The rank actually seen this cycle, for history (the table keeps the peak)
+        if tag in snapshot:
+            snapshot[tag]["ranked"] = trophies
         
         old_rank = ranked.get(tag, 0)
         new_rank = trophies
@@ -138,7 +185,8 @@ async def update_ranked_table(members):
             icon_id = m.get("icon", {}).get("id", 0)
             icon_url = f"https://cdn.brawlify.com/profile-icons/regular/{icon_id}.png"
             
-            rank_name = Ranks2.get(new_rank, f"Rank {new_rank}")
+            rank = catalog.rank(new_rank)
+            rank_name = rank["name"] if rank else f"Rank {new_rank}"
             
             embed = discord.Embed(
                 title=f"{name} Ranked Up!",
@@ -148,32 +196,32 @@ async def update_ranked_table(members):
             embed.set_author(name=name, icon_url=icon_url)
             embed.set_thumbnail(url=thumbnailurl)
             
-            channel = client.get_channel(GLOBAL_TRACKING_CHANNEL_ID)
-            if channel:
-                await channel.send(embed=embed)
+            await post_embed(club.tracking_channel_id, embed)
         
         ranked[tag] = max(old_rank, new_rank)
     
-    save_data2(data2)
-    print("✅ Ranked table updated.")
+    print(f"✅ Ranked table updated ({club.name}).")
 
 # ----------------- Trophies Table + Box Milestones ----------------- #
-async def update_trophies_table(members):
-    data2 = load_data2()
+def detect_season_reset(data2, current_global_best):
+    """A drop of 5000+ in the global #1's trophies means the season was reset."""
+    global_trophy_leader = data2.get("GlobalTrophyLeader", 0)
+    if current_global_best and global_trophy_leader:
+        return global_trophy_leader - current_global_best >= 5000
+    return False
+
+async def update_trophies_table(club, members, snapshot, data2, current_global_best):
     trophies_table = data2.setdefault("Trophies", {})
     last_box_table = data2.setdefault("LastTrophyBox", {})
     global_trophy_leader = data2.setdefault("GlobalTrophyLeader", 0)
     
-    current_global_best = await get_global_trophy_leader()
-    
     is_season_reset = False
     # Detect season reset
-    if current_global_best and global_trophy_leader:
-        if global_trophy_leader - current_global_best >= 5000:
-            is_season_reset = True
-            print(f"🚨 Season Reset Detected! Old Global #1: {global_trophy_leader}, New: {current_global_best}")
-            trophies_table.clear()
-            last_box_table.clear()
+    if detect_season_reset(data2, current_global_best):
+        is_season_reset = True
+        print(f"🚨 Season Reset Detected ({club.name})! Old Global #1: {global_trophy_leader}, New: {current_global_best}")
+        trophies_table.clear()
+        last_box_table.clear()
     
     if current_global_best > global_trophy_leader or is_season_reset:
         data2["GlobalTrophyLeader"] = current_global_best
@@ -193,12 +241,18 @@ async def update_trophies_table(members):
         if not tag:
             continue
         
-        player_data = await get_player_data(tag)
+        entry = snapshot.get(tag, {})
+        # Unchanged profile: tables already reflect it (a season reset rebuilds everyone)
+        if not is_season_reset and not entry.get("profile_changed", True) and tag in trophies_table:
+            continue
+        
+        player_data = entry.get("profile")
         if not player_data:
             continue
         
         brawlers = player_data.get("brawlers", [])
         current_brawler_trophies = {b.get("name", "Unknown"): b.get("trophies", 0) for b in brawlers}
+        brawler_ids = {b.get("name", "Unknown"): b.get("id", 0) for b in brawlers}
         previous_brawler_trophies = trophies_table.get(tag, {})
         
         new_brawler_trophies = {}
@@ -215,10 +269,7 @@ async def update_trophies_table(members):
                     profile_icon_id = player_data.get("icon", {}).get("id", 0)
                     profile_icon_url = f"https://cdn.brawlify.com/profile-icons/regular/{profile_icon_id}.png"
                     
-                    # Find brawler ID for thumbnail
-                    brawler_obj = next((b for b in brawlers if b.get("name") == bname), None)
-                    brawler_id = brawler_obj.get("id", 0) if brawler_obj else 0
-                    brawler_icon_url = f"https://cdn.brawlify.com/brawlers/emoji/{brawler_id}.png"
+                    brawler_icon_url = f"https://cdn.brawlify.com/brawlers/emoji/{brawler_ids[bname]}.png"
                     
                     embed = discord.Embed(
                         title=f"{name} Got A New tier max!",
@@ -228,10 +279,8 @@ async def update_trophies_table(members):
                     embed.set_author(name=name, icon_url=profile_icon_url)
                     embed.set_thumbnail(url=brawler_icon_url)
                     
-                    channel = client.get_channel(GLOBAL_TRACKING_CHANNEL_ID)
-                    if channel:
-                        await channel.send(embed=embed)
-                        print(f"✅ Sent tier max notification for {name} - {bname}")
+                    await post_embed(club.tracking_channel_id, embed)
+                    print(f"✅ Sent tier max notification for {name} - {bname}")
             
             if is_season_reset:
                 new_brawler_trophies[bname] = trophies
@@ -245,61 +294,185 @@ async def update_trophies_table(members):
         
         last_box_amount = last_box_table.get(tag, 0)
         
-        # Trophy Box milestone check
-        for box in Boxes:
-            if box["amount"] == 0:
-                continue
+        # Trophy Box milestone check: every box newly crossed since the last one
+        for box in catalog.boxes_between(last_box_amount, extra_trophies_sum):
+            # Extract emoji ID from format <:name:id>
+            emoji_str = box["emojiid"]
+            emoji_id = emoji_str.split(":")[-1].rstrip(">")
             
-            if extra_trophies_sum >= box["amount"] > last_box_amount:
-                # Extract emoji ID from format <:name:id>
-                emoji_str = box["emojiid"]
-                emoji_id = emoji_str.split(":")[-1].rstrip(">")
-                
-                embed = discord.Embed(
-                    title=f"{name} Reached a Trophy Box!",
-                    description=f"{name} got a **{box['name']}**!",
-                    color=discord.Color.purple()
-                )
-                embed.set_author(name=name, icon_url=profile_icon_url)
-                embed.set_thumbnail(url=f"https://cdn.discordapp.com/emojis/{emoji_id}.png")
-                
-                channel = client.get_channel(GLOBAL_TRACKING_CHANNEL_ID)
-                if channel:
-                    await channel.send(embed=embed)
-                
-                last_box_table[tag] = box["amount"]
-    
-    save_data2(data2)
+            embed = discord.Embed(
+                title=f"{name} Reached a Trophy Box!",
+                description=f"{name} got a **{box['name']}**!",
+                color=discord.Color.purple()
+            )
+            embed.set_author(name=name, icon_url=profile_icon_url)
+            embed.set_thumbnail(url=f"https://cdn.discordapp.com/emojis/{emoji_id}.png")
+            
+            await post_embed(club.tracking_channel_id, embed)
+            
+            last_box_table[tag] = box["amount"]
     
     if is_season_reset:
         print("✅ Season reset detected: trophies and LastTrophyBox tables cleared and saved.")
     else:
-        print("✅ Trophies table updated with 1000+ brawler check and Trophy Box milestones.")
+        print(f"✅ Trophies table updated with 1000+ brawler check and Trophy Box milestones ({club.name}).")
+
+# ----------------- History ----------------- #
+def record_history(snapshot):
+    """
+    Appends this cycle's trophies and ranked tier per member (changes only).
+    The ranked tier is the one from the newest soloRanked battle seen this
+    cycle (set by update_ranked_table); members without one keep their last sample.
+    """
+    now = int(time.time())
+    for tag, entry in snapshot.items():
+        profile = entry.get("profile")
+        if not profile:
+            continue
+        values = {b.get("name", "Unknown"): b.get("trophies", 0) for b in profile.get("brawlers", [])}
+        values[TOTAL] = profile.get("trophies")
+        values[RANKED] = entry.get("ranked")
+        record_samples(tag, values, now)
 
 # ----------------- Club Polling ----------------- #
-async def poll_for_changes():
-    await client.wait_until_ready()
-    print("🟢 Club tracking started.")
+async def poll_members(club, members, due_members, data2, current_global_best, applied=None):
+    """
+    One tracking pass for a club: fetches `due_members`, runs every tracker
+    against the full `members` list, then persists state and history.
+    `applied` ({tag: (profile digest, battlelog digest)}) is the caller's
+    record of what the trackers already processed; it is updated once the
+    pass has been applied. Without it every member counts as changed.
+    Returns the snapshot.
+    """
+    cycle_start = time.perf_counter()
+    
+    # One fetch per due member and one state save per pass
+    snapshot = await fetch_cycle_snapshot(due_members, applied)
+    await update_ranked_table(club, members, snapshot, data2)
+    await update_trophies_table(club, members, snapshot, data2, current_global_best)
+    
+    save_data2(club, data2)
+    record_history(snapshot)
+    if applied is not None:
+        for tag, entry in snapshot.items():
+            applied[tag] = entry["digests"]
+    
+    metrics.observe("poll_cycle_seconds", time.perf_counter() - cycle_start, job="milestones", club=club.tag)
+    metrics.inc("poll_members_total", len(due_members), job="milestones", club=club.tag)
+    print(f"✅ Polled {len(due_members)}/{len(members)} members of {club.name}.")
+    return snapshot
+
+async def track_clubs(clubs, stop: asyncio.Event):
+    """
+    Polls `clubs` until `stop` is set. Runs in the bot process, or in a
+    worker process per shard of clubs (see workers.py).
+    """
+    print(f"🟢 Club tracking started for {len(clubs)} club(s).")
     
-    while not client.is_closed():
-        print("🔄 Checking club members...")
-        members = await get_club_members()
+    # This loop is the only writer, so state is loaded once and kept in memory
+    data2 = {club.key: load_data2(club) for club in clubs}
+    # Digests of the responses the trackers applied, per club. Kept with the
+    # state it describes: a restarted tracker reloads the store and starts
+    # this empty, so every member is re-applied once.
+    applied = {club.key: {} for club in clubs}
+    # One scheduler for every club, keyed by (club key, member tag)
+    scheduler = MemberScheduler(POLL_MIN_SECONDS, POLL_MAX_SECONDS, POLL_IDLE_FACTOR)
+    members = {}   # club key -> member list
+    current_global_best = 0
+    members_refreshed = 0
+    
+    async def poll_club(club, due_tags, now):
+        club_members = members[club.key]
+        # A season reset must rebuild every member in the same pass
+        if detect_season_reset(data2[club.key], current_global_best):
+            due_tags |= {m.get("tag") for m in club_members if m.get("tag")}
+        if not due_tags:
+            return
+        
+        due_members = [m for m in club_members if m.get("tag") in due_tags]
+        snapshot = await poll_members(club, club_members, due_members, data2[club.key], current_global_best, applied[club.key])
+        
+        for tag in due_tags:
+            entry = snapshot.get(tag)
+            if entry is None or entry["digests"][1] is None:
+                # Failed fetch (429, breaker open, timeout): says nothing about activity
+                scheduler.retry((club.key, tag), now)
+            else:
+                scheduler.reschedule((club.key, tag), last_battle_time(entry["battlelog"]), now)
+    
+    while not stop.is_set():
+        now = time.time()
+        
+        # Member lists and the global #1 are refreshed every POLL_SECONDS;
+        # the global #1 is one request however many clubs are tracked
+        if now - members_refreshed >= POLL_SECONDS:
+            print("🔄 Checking club members...")
+            current_global_best, *fresh = await asyncio.gather(
+                get_global_trophy_leader(),
+                *(get_club_members(club.tag) for club in clubs),
+            )
+            members_refreshed = now
+            for club, fresh_members in zip(clubs, fresh):
+                if fresh_members:
+                    members[club.key] = fresh_members
+                    current_tags = {fm.get("tag") for fm in fresh_members}
+                    applied[club.key] = {t: d for t, d in applied[club.key].items() if t in current_tags}
+                else:
+                    print(f"⚠️ Could not fetch club members for {club.name}.")
+            scheduler.sync(
+                [(key, m.get("tag")) for key, club_members in members.items() for m in club_members if m.get("tag")],
+                now,
+            )
         
         if not members:
-            print("⚠️ Could not fetch club members.")
-            await asyncio.sleep(POLL_SECONDS)
+            await _sleep_until(stop, POLL_SECONDS)
             continue
         
-        await update_ranked_table(members)
-        await update_trophies_table(members)
+        due = scheduler.pop_due(now, limit=POLL_MEMBERS_PER_PASS, group=lambda key: key[0])
+        # Clubs run side by side; the shared rate limiter paces them together
+        await asyncio.gather(*(
+            poll_club(club, {tag for key, tag in due if key == club.key}, now)
+            for club in clubs if club.key in members
+        ))
         
-        await asyncio.sleep(POLL_SECONDS)
+        next_due = scheduler.seconds_until_next(time.time())
+        until_refresh = members_refreshed + POLL_SECONDS - time.time()
+        await _sleep_until(stop, max(1, min(x for x in (next_due, until_refresh) if x is not None)))
+
+async def _sleep_until(stop: asyncio.Event, seconds: float):
+    """Sleeps `seconds`, waking early when `stop` is set."""
+    try:
+        await asyncio.wait_for(stop.wait(), seconds)
+    except asyncio.TimeoutError:
+        pass
+
+async def poll_for_changes():
+    if WORKER_PROCESSES > 0:
+        # Trackers run in worker processes; this process only posts their events
+        from workers import WorkerPool
+        global worker_pool
+        worker_pool = WorkerPool(CLUBS, WORKER_PROCESSES)
+        await worker_pool.run(post_embed, record_samples)
+    else:
+        await track_clubs(CLUBS, stop_tracking)
+
+async def stop_workers(timeout: float = SHUTDOWN_TIMEOUT_SECONDS):
+    """
+    Stops tracking (and worker processes, if any) and waits up to `timeout`
+    for the pass in progress to post and save. Call on shutdown, before the
+    client closes, so finished passes are never announced twice.
+    """
+    stop_tracking.set()
+    if worker_pool:
+        await worker_pool.stop()
+    task = milestones_job.task
+    if task is not None and not task.done():
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        if not done:
+            print(f"⚠️ Club tracking still busy after {timeout:g}s, cancelling it")
 
-# ----------------- Bot Startup ----------------- #
-@client.event
-async def on_ready():
-    print(f"✅ Logged in as {client.user}")
-    asyncio.create_task(poll_for_changes())
+stop_tracking = asyncio.Event()
+worker_pool = None
 
-if __name__ == "__main__":
-    client.run(DISCORD_TOKEN)
\ No newline at end of file
+# Started by bot.py with the rest of the jobs, on the shared client
+milestones_job = jobs.add("milestones", poll_for_changes)
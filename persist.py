@@ -0,0 +1,111 @@
+import os
+import json
+import asyncio
+import tempfile
+
+# ------------------ Atomic Writes ------------------ #
+
+def atomic_write_json(path: str, obj, indent: int = 4):
+    """
+    Writes JSON to `path` via temp file + fsync + rename, so a crash mid-write
+    leaves either the old file or the new one, never a truncated file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    # A unique temp name, so concurrent writers never truncate each other's file
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            # mkstemp creates the file 0600; keep the mode the target already has
+            try:
+                os.fchmod(f.fileno(), os.stat(path).st_mode & 0o777)
+            except OSError:
+                os.fchmod(f.fileno(), 0o644)
+            json.dump(obj, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+    # Persist the rename itself (not supported on every platform)
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+# ------------------ Write-Behind ------------------ #
+
+class WriteBehind:
+    """
+    Debounced write-behind for a blocking `write()` callable.
+
+    mark_dirty() schedules a write `delay` seconds later; every mark within
+    that window is coalesced into the same write. Writes run in a worker
+    thread so serialization and fsync never block the event loop. Outside a
+    running loop (e.g. at import time) the write happens immediately.
+    """
+
+    def __init__(self, write, delay: float = 2.0, name: str = "state"):
+        self.write = write
+        self.delay = delay
+        self.name = name
+        self.writes = 0
+
+        self._dirty = False
+        self._task = None
+        self._wake = None
+
+    def mark_dirty(self):
+        self._dirty = True
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._write_now()
+            return
+
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def _write_now(self):
+        self._dirty = False
+        self.write()
+        self.writes += 1
+
+    async def _run(self):
+        try:
+            await asyncio.wait_for(self._wake.wait(), self.delay)
+        except asyncio.TimeoutError:
+            pass
+
+        # Anything marked while a write is running is picked up by the next pass
+        while self._dirty:
+            self._dirty = False
+            try:
+                await asyncio.to_thread(self.write)
+                self.writes += 1
+            except Exception as e:
+                # Stay dirty so the next mark_dirty()/flush() retries
+                self._dirty = True
+                print(f"⚠️ [{self.name}] Write-behind flush failed: {e}")
+                return
+
+    async def flush(self):
+        """Writes any pending changes now and waits for them. Call on shutdown."""
+        if self._task is not None and not self._task.done():
+            self._wake.set()
+            await self._task
+        if self._dirty:
+            self._dirty = False
+            await asyncio.to_thread(self.write)
+            self.writes += 1
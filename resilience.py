@@ -0,0 +1,172 @@
+import time
+import random
+import asyncio
+
+# ------------------ Resilience ------------------ #
+# Retries with exponential backoff + jitter, Retry-After handling, a circuit
+# breaker per upstream host and one retry budget shared by every host so a
+# struggling upstream never sees more than a fraction of extra load.
+
+class RetryableError(Exception):
+    """
+    Raised by an attempt that may succeed if retried.
+    `retry_after` is the server-requested delay in seconds, if any.
+    `trips_breaker` is False for throttling (429), which says nothing about host health.
+    """
+
+    def __init__(self, message: str = "", retry_after: float = None, trips_breaker: bool = True):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.trips_breaker = trips_breaker
+
+class CircuitOpenError(Exception):
+    """The host's circuit breaker is open; the request was not sent."""
+
+def parse_retry_after(value) -> float:
+    """Parses a Retry-After header given in seconds. None if absent or unparseable."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. After `reset_timeout`
+    seconds one trial request is let through (half-open): success closes the
+    circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def release_trial(self):
+        """Ends a half-open trial that neither succeeded nor failed (e.g. a 404)."""
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+class RetryBudget:
+    """
+    Every request deposits `ratio` tokens and every retry withdraws one, so
+    retries stay below roughly `ratio` of total traffic. `capacity` bounds
+    how many retries can be saved up for a burst.
+    """
+
+    def __init__(self, ratio: float = 0.2, capacity: float = 10):
+        self.ratio = ratio
+        self.capacity = capacity
+        self.tokens = capacity
+        self.exhausted = 0
+
+    def record_request(self):
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def try_retry(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        self.exhausted += 1
+        return False
+
+class HostPolicy:
+    """Retry/breaker policy for one upstream host."""
+
+    def __init__(self, host: str, budget: RetryBudget, max_attempts: int = 3,
+                 base_delay: float = 0.5, max_delay: float = 10,
+                 breaker: CircuitBreaker = None, max_retry_after: float = 60):
+        self.host = host
+        self.budget = budget
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.breaker = breaker or CircuitBreaker()
+
+        # A 429's Retry-After pauses every request to this host, not just the retry
+        self.paused_until = 0.0
+        self.retries = 0
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (0-based) retry."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def run(self, attempt_fn):
+        """
+        Runs `await attempt_fn()` with retries. Raises CircuitOpenError if the
+        host is tripped or paused for longer than max_retry_after, or the last
+        RetryableError once retries are exhausted.
+        """
+        self.budget.record_request()
+        for attempt in range(self.max_attempts):
+            pause = self.paused_until - time.monotonic()
+            if pause > self.max_retry_after:
+                # Too long to wait for; fail fast instead of hitting the host
+                raise CircuitOpenError(f"{self.host} asked us to pause for {pause:.0f}s")
+            if pause > 0:
+                await asyncio.sleep(pause)
+
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"circuit open for {self.host}")
+
+            try:
+                result = await attempt_fn()
+            except RetryableError as e:
+                if e.trips_breaker:
+                    self.breaker.record_failure()
+                else:
+                    # A 429 says nothing about host health: leave the breaker as it was
+                    self.breaker.release_trial()
+
+                if e.retry_after is not None:
+                    # Every request to the host honours the pause, however long;
+                    # only this request gives up when it is too long to wait for
+                    self.paused_until = max(self.paused_until, time.monotonic() + e.retry_after)
+                    if e.retry_after > self.max_retry_after:
+                        raise
+                    delay = 0   # the host-wide pause above covers it
+                else:
+                    delay = self.backoff(attempt)
+
+                if attempt + 1 >= self.max_attempts or not self.budget.try_retry():
+                    raise
+                self.retries += 1
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                self.breaker.release_trial()
+                raise
+
+            self.breaker.record_success()
+            return result
@@ -0,0 +1,107 @@
+import heapq
+from collections import deque
+from datetime import datetime, timezone
+
+# ------------------ Adaptive Member Scheduler ------------------ #
+# Every tracked member has a next-due time in a min-heap. After each fetch
+# the member is rescheduled from their battlelog: the longer since their last
+# battle, the longer until the next fetch, clamped to [min_interval, max_interval].
+# Keys are opaque; with several clubs they are (club, tag) pairs and pop_due
+# shares a per-pass budget round-robin between clubs.
+
+def last_battle_time(battle_log) -> float:
+    """Returns the newest battleTime in a battlelog as a UNIX timestamp, or None."""
+    newest = None
+    for entry in battle_log or []:
+        raw = entry.get("battleTime")
+        if not raw:
+            continue
+        try:
+            ts = datetime.strptime(raw, "%Y%m%dT%H%M%S.%fZ").replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            continue
+        if newest is None or ts > newest:
+            newest = ts
+    return newest
+
+class MemberScheduler:
+    def __init__(self, min_interval: float, max_interval: float, idle_factor: float = 0.25):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.idle_factor = idle_factor
+
+        self._heap = []      # (due, tag); stale entries are skipped lazily
+        self._due = {}       # tag -> current due time
+        self.intervals = {}  # tag -> last chosen interval
+
+    def __len__(self):
+        return len(self._due)
+
+    def _push(self, tag: str, due: float):
+        self._due[tag] = due
+        heapq.heappush(self._heap, (due, tag))
+
+    def sync(self, tags, now: float):
+        """Adds new members (due immediately) and forgets members who left."""
+        tags = set(tags)
+        for tag in list(self._due):
+            if tag not in tags:
+                del self._due[tag]
+                self.intervals.pop(tag, None)
+        for tag in tags:
+            if tag not in self._due:
+                self._push(tag, now)
+
+    def pop_due(self, now: float, limit: int = None, group=None) -> list:
+        """
+        Removes and returns every member due at `now`. With `limit`, at most
+        that many are returned, taken round-robin across `group(key)` (most
+        overdue first within a group) so a big club cannot starve a small
+        one; the rest stay due for the next pass.
+        """
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, tag = heapq.heappop(self._heap)
+            if self._due.get(tag) != when:
+                continue
+            del self._due[tag]
+            due.append((when, tag))
+
+        if limit is None or len(due) <= limit:
+            return [tag for _, tag in due]
+
+        queues = {}
+        for entry in due:
+            queues.setdefault(group(entry[1]) if group else None, deque()).append(entry)
+        picked = []
+        while len(picked) < limit:
+            for queue in queues.values():
+                if queue and len(picked) < limit:
+                    picked.append(queue.popleft()[1])
+        for queue in queues.values():
+            for when, tag in queue:
+                self._push(tag, when)
+        return picked
+
+    def interval_for(self, last_battle: float, now: float) -> float:
+        if last_battle is None:
+            return self.max_interval
+        idle = max(0.0, now - last_battle)
+        return min(self.max_interval, max(self.min_interval, idle * self.idle_factor))
+
+    def reschedule(self, tag: str, last_battle: float, now: float):
+        """Schedules the member's next fetch from their latest battle time."""
+        interval = self.interval_for(last_battle, now)
+        self.intervals[tag] = interval
+        self._push(tag, now + interval)
+
+    def retry(self, tag: str, now: float):
+        """Schedules a member whose fetch failed: back after min_interval, interval kept."""
+        self._push(tag, now + self.min_interval)
+
+    def seconds_until_next(self, now: float) -> float:
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - now)
@@ -0,0 +1,35 @@
+import asyncio
+
+# ------------------ Request Coalescing ------------------ #
+# Concurrent callers asking for the same key share one in-flight call:
+# the first caller starts it, everyone else awaits the same result (or
+# exception). Once it finishes the key is forgotten, so nothing is cached.
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self.shared = 0   # callers that joined an existing call
+
+    def _done(self, key, fut):
+        self._calls.pop(key, None)
+        # Mark the exception as retrieved in case every caller was cancelled
+        if not fut.cancelled():
+            fut.exception()
+
+    async def do(self, key, fn):
+        """
+        Returns `await fn()`, sharing the call with any concurrent caller
+        using the same key. Results are shared objects: do not mutate them.
+        """
+        fut = self._calls.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(fn())
+            self._calls[key] = fut
+            fut.add_done_callback(lambda f: self._done(key, f))
+        else:
+            self.shared += 1
+        # shield: one caller being cancelled must not cancel the others
+        return await asyncio.shield(fut)
+
+    def __len__(self):
+        return len(self._calls)
@@ -0,0 +1,301 @@
+import os
+import json
+import sqlite3
+import threading
+
+from config import config, CONFIG_FILE
+from persist import WriteBehind, atomic_write_json
+
+# ------------------ SQLite State Store ------------------ #
+# Hot bot state (ranked/trophy tracking, club snapshot, daily flags) lives in
+# SQLite in WAL mode so a change to one member is one row upsert instead of a
+# full JSON rewrite. data.json keeps only the bot configuration.
+
+DB_FILE = config.get("STATE_DB", "state.db")
+# Seconds to coalesce state changes before one write-behind flush
+STATE_FLUSH_DELAY = float(config.get("STATE_FLUSH_DELAY", 2))
+DATA_FILE = CONFIG_FILE
+DATA_FILE2 = "data2.json"
+
+# Keys that used to live in data.json next to the config
+HOT_CONFIG_KEYS = ("club_cache", "DailyUpdate", "GlobalSentToday")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ranked (
+    tag  TEXT PRIMARY KEY,
+    rank INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS brawler_trophies (
+    tag      TEXT NOT NULL,
+    brawler  TEXT NOT NULL,
+    trophies INTEGER NOT NULL,
+    PRIMARY KEY (tag, brawler)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS last_trophy_box (
+    tag    TEXT PRIMARY KEY,
+    amount INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS club_snapshot (
+    id      INTEGER PRIMARY KEY CHECK (id = 1),
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily_flags (
+    name  TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def _diff(old: dict, new: dict):
+    """Returns (upserts, deletes) turning `old` into `new`."""
+    upserts = [(k, v) for k, v in new.items() if old.get(k) != v]
+    deletes = [k for k in old if k not in new]
+    return upserts, deletes
+
+class StateStore:
+    """
+    Writes are write-behind: setters update in-memory state and mark the store
+    dirty, and one coalesced transaction later runs in a worker thread. Reads
+    are served from memory, so the event loop never waits on SQLite.
+    """
+
+    def __init__(self, path: str = DB_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+        # _db_lock guards the connection; _lock only the pending state below and
+        # is never held across SQLite calls, so setters on the loop stay cheap
+        self._db_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.writer = WriteBehind(self._flush, delay=STATE_FLUSH_DELAY, name="state")
+
+        self._flags = dict(self.conn.execute("SELECT name, value FROM daily_flags"))
+        self._club = None
+
+        # Changes waiting for the next flush
+        self._pending_flags = {}
+        self._pending_club = None
+        self._pending_milestones = None
+
+        # Last state written by save_milestones, used to write only changes
+        self._persisted = None
+
+    async def flush(self):
+        """Writes pending changes now. Call on shutdown."""
+        await self.writer.flush()
+
+    def close(self):
+        with self._db_lock:
+            self.conn.close()
+
+    def _flush(self):
+        """Runs in a worker thread: writes every pending change in one transaction."""
+        with self._lock:
+            flags, self._pending_flags = self._pending_flags, {}
+            club, self._pending_club = self._pending_club, None
+            milestones, self._pending_milestones = self._pending_milestones, None
+        with self._db_lock:
+            try:
+                with self.conn:
+                    self.conn.execute("BEGIN")
+                    self.conn.executemany(
+                        "INSERT INTO daily_flags (name, value) VALUES (?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+                        list(flags.items()),
+                    )
+                    if club is not None:
+                        self.conn.execute(
+                            "INSERT INTO club_snapshot (id, payload) VALUES (1, ?) "
+                            "ON CONFLICT(id) DO UPDATE SET payload = excluded.payload",
+                            (json.dumps(club, separators=(",", ":")),),
+                        )
+                    if milestones is not None:
+                        old = self._persisted or self._copy_milestones({})
+                        self._write_milestone_diff(old, milestones)
+            except Exception:
+                # Put the changes back (newer pending values win) so a retry writes them
+                with self._lock:
+                    self._pending_flags = {**flags, **self._pending_flags}
+                    if self._pending_club is None:
+                        self._pending_club = club
+                    if self._pending_milestones is None:
+                        self._pending_milestones = milestones
+                raise
+            if milestones is not None:
+                self._persisted = milestones
+
+    # ----------------- Meta / Flags ----------------- #
+
+    def get_meta(self, key: str, default=None):
+        with self._db_lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key: str, value):
+        with self._db_lock:
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, json.dumps(value)),
+            )
+
+    def get_flag(self, name: str, default=None):
+        return self._flags.get(name, default)
+
+    def set_flag(self, name: str, value: str):
+        self._flags[name] = value
+        with self._lock:
+            self._pending_flags[name] = value
+        self.writer.mark_dirty()
+
+    # ----------------- Club Snapshot ----------------- #
+
+    def get_club_snapshot(self) -> dict:
+        if self._club is None:
+            with self._db_lock:
+                row = self.conn.execute("SELECT payload FROM club_snapshot WHERE id = 1").fetchone()
+            self._club = json.loads(row[0]) if row else {}
+        return self._club
+
+    def set_club_snapshot(self, club_json: dict):
+        """Stores the snapshot. `club_json` must not be mutated afterwards."""
+        self._club = club_json
+        with self._lock:
+            self._pending_club = club_json
+        self.writer.mark_dirty()
+
+    # ----------------- Milestone Tables ----------------- #
+
+    def load_milestones(self) -> dict:
+        """
+        Returns the milestone state in the shape data2.json used:
+        {"Ranked": {...}, "Trophies": {...}, "GlobalTrophyLeader": int, "LastTrophyBox": {...}}
+        """
+        with self._lock:
+            if self._pending_milestones is not None:
+                return self._copy_milestones(self._pending_milestones)
+
+        global_leader = self.get_meta("GlobalTrophyLeader", 0)
+        with self._db_lock:
+            trophies = {}
+            for tag, brawler, value in self.conn.execute("SELECT tag, brawler, trophies FROM brawler_trophies"):
+                trophies.setdefault(tag, {})[brawler] = value
+
+            data2 = {
+                "Ranked": dict(self.conn.execute("SELECT tag, rank FROM ranked")),
+                "Trophies": trophies,
+                "GlobalTrophyLeader": global_leader,
+                "LastTrophyBox": dict(self.conn.execute("SELECT tag, amount FROM last_trophy_box")),
+            }
+            self._persisted = self._copy_milestones(data2)
+        return data2
+
+    @staticmethod
+    def _copy_milestones(data2: dict) -> dict:
+        return {
+            "Ranked": dict(data2.get("Ranked", {})),
+            "Trophies": {tag: dict(b) for tag, b in data2.get("Trophies", {}).items()},
+            "GlobalTrophyLeader": data2.get("GlobalTrophyLeader", 0),
+            "LastTrophyBox": dict(data2.get("LastTrophyBox", {})),
+        }
+
+    def save_milestones(self, data2: dict):
+        """
+        Queues the milestone state; the next flush writes only the rows that
+        changed since the last load/save.
+        """
+        snapshot = self._copy_milestones(data2)
+        with self._lock:
+            self._pending_milestones = snapshot
+        self.writer.mark_dirty()
+
+    def _write_milestone_diff(self, old: dict, new: dict):
+        upserts, deletes = _diff(old["Ranked"], new["Ranked"])
+        self.conn.executemany(
+            "INSERT INTO ranked (tag, rank) VALUES (?, ?) "
+            "ON CONFLICT(tag) DO UPDATE SET rank = excluded.rank",
+            upserts,
+        )
+        self.conn.executemany("DELETE FROM ranked WHERE tag = ?", [(t,) for t in deletes])
+
+        upserts, deletes = _diff(old["LastTrophyBox"], new["LastTrophyBox"])
+        self.conn.executemany(
+            "INSERT INTO last_trophy_box (tag, amount) VALUES (?, ?) "
+            "ON CONFLICT(tag) DO UPDATE SET amount = excluded.amount",
+            upserts,
+        )
+        self.conn.executemany("DELETE FROM last_trophy_box WHERE tag = ?", [(t,) for t in deletes])
+
+        old_trophies, new_trophies = old["Trophies"], new["Trophies"]
+        rows, removed = [], []
+        for tag, brawlers in new_trophies.items():
+            upserts, deletes = _diff(old_trophies.get(tag, {}), brawlers)
+            rows.extend((tag, b, v) for b, v in upserts)
+            removed.extend((tag, b) for b in deletes)
+        self.conn.executemany(
+            "INSERT INTO brawler_trophies (tag, brawler, trophies) VALUES (?, ?, ?) "
+            "ON CONFLICT(tag, brawler) DO UPDATE SET trophies = excluded.trophies",
+            rows,
+        )
+        self.conn.executemany("DELETE FROM brawler_trophies WHERE tag = ? AND brawler = ?", removed)
+        self.conn.executemany(
+            "DELETE FROM brawler_trophies WHERE tag = ?",
+            [(t,) for t in old_trophies if t not in new_trophies],
+        )
+
+        if old["GlobalTrophyLeader"] != new["GlobalTrophyLeader"]:
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('GlobalTrophyLeader', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (json.dumps(new["GlobalTrophyLeader"]),),
+            )
+
+    # ----------------- JSON Migration ----------------- #
+
+    def migrate_from_json(self, data_file: str = DATA_FILE, data2_file: str = DATA_FILE2):
+        """
+        One-shot import of data2.json and the hot keys of data.json.
+        data2.json is renamed to *.migrated and the hot keys are removed from
+        data.json so it only holds configuration afterwards.
+        """
+        if self.get_meta("migrated"):
+            return
+
+        if os.path.exists(data2_file):
+            try:
+                with open(data2_file, "r") as f:
+                    data2 = json.load(f)
+            except json.JSONDecodeError:
+                print(f"⚠️ Could not decode {data2_file}, starting milestone state empty.")
+                data2 = {}
+            self._persisted = self._copy_milestones({})
+            self.save_milestones(data2)
+            os.replace(data2_file, data2_file + ".migrated")
+            print(f"✅ Migrated {data2_file} into {self.path}")
+
+        if os.path.exists(data_file):
+            with open(data_file, "r") as f:
+                data = json.load(f)
+            hot = {k: data.pop(k) for k in HOT_CONFIG_KEYS if k in data}
+            if hot:
+                if hot.get("club_cache"):
+                    self.set_club_snapshot(hot["club_cache"])
+                if hot.get("DailyUpdate"):
+                    self.set_flag("DailyUpdate", hot["DailyUpdate"])
+                if hot.get("GlobalSentToday", {}).get("date"):
+                    self.set_flag("GlobalSentToday", hot["GlobalSentToday"]["date"])
+
+                atomic_write_json(data_file, data)
+                print(f"✅ Moved {', '.join(hot)} from {data_file} into {self.path}")
+
+        self.set_meta("migrated", True)
+        self._persisted = None
+
+state = StateStore()
+state.migrate_from_json()
@@ -0,0 +1,166 @@
+import queue
+import asyncio
+import threading
+import multiprocessing
+
+import discord
+
+from config import config
+
+# ------------------ Worker Processes ------------------ #
+# Optional (WORKER_PROCESSES in data.json): the milestone trackers run in
+# separate processes, each owning a shard of the tracked clubs, so JSON
+# decoding, diffing and embed building use more than one core. Workers never
+# talk to Discord; they put events on one queue and the bot process posts them
+# and records history, so Discord and history.db each keep a single writer.
+#
+# Clubs are the unit of sharding so each club's milestone tables are written
+# by exactly one process. The bot process still writes that club's snapshot
+# and daily flags to the same state file; the tables are disjoint and SQLite
+# (WAL, busy timeout) serializes the two processes' transactions.
+#
+# The API rate and burst are split so the process group as a whole stays
+# within API_RATE_PER_SEC: the bot process keeps COORDINATOR_API_SHARE for its
+# own calls (catalog refresh, global leaderboard, commands) and the workers
+# share the rest equally.
+#
+# Events on the queue:
+#   ("embed", channel_id, embed_dict)
+#   ("history", tag, {series: value}, ts)
+
+# How often the coordinator checks that its workers are still alive
+SUPERVISE_SECONDS = 1.0
+
+# Fraction of the API rate and burst the bot process keeps for itself
+COORDINATOR_API_SHARE = min(0.9, max(0.05, float(config.get("COORDINATOR_API_SHARE", 0.2))))
+
+def limit_api(fraction: float):
+    """Shrinks this process's API rate and burst to `fraction` of the configured totals."""
+    import helpers
+    helpers.api_limiter.rate = helpers.API_RATE_PER_SEC * fraction
+    helpers.api_limiter.capacity = max(1, int(helpers.API_BURST * fraction))
+    helpers.api_limiter.tokens = min(helpers.api_limiter.tokens, helpers.api_limiter.capacity)
+
+class QueueSink:
+    """Stands in for milestones.post_embed / record_samples inside a worker."""
+
+    def __init__(self, events):
+        self.events = events
+
+    async def post_embed(self, channel_id, embed):
+        self.events.put(("embed", channel_id, embed.to_dict()))
+
+    def record_samples(self, tag, values, ts):
+        self.events.put(("history", tag, values, ts))
+
+def worker_main(shard: int, club_keys: list, shards: int, events, stop):
+    """Entry point of a worker process (must stay importable for spawn)."""
+    asyncio.run(_run_worker(shard, club_keys, shards, events, stop))
+
+async def _run_worker(shard, club_keys, shards, events, stop):
+    import helpers
+    import milestones
+    from clubs import CLUBS, flush_all
+
+    clubs = [c for c in CLUBS if c.key in club_keys]
+    sink = QueueSink(events)
+    milestones.post_embed = sink.post_embed
+    milestones.record_samples = sink.record_samples
+
+    # Every worker gets an equal slice of what the coordinator leaves over
+    share = (1 - COORDINATOR_API_SHARE) / shards
+    limit_api(share)
+    milestones.POLL_MEMBERS_PER_PASS = max(1, int(milestones.POLL_MEMBERS_PER_PASS * share))
+
+    # Bridge the process-wide stop flag to the worker's loop
+    loop = asyncio.get_running_loop()
+    stop_tracking = asyncio.Event()
+    threading.Thread(
+        target=lambda: stop.wait() and loop.call_soon_threadsafe(stop_tracking.set),
+        daemon=True,
+    ).start()
+
+    print(f"🧵 Worker {shard} tracking {', '.join(c.name for c in clubs)}")
+    try:
+        await milestones.track_clubs(clubs, stop_tracking)
+    finally:
+        await flush_all()
+        await helpers.close_session()
+
+class WorkerPool:
+    def __init__(self, clubs: list, processes: int):
+        count = max(1, min(processes, len(clubs)))
+        self.shards = [[c.key for c in clubs[i::count]] for i in range(count)]
+        self.ctx = multiprocessing.get_context("spawn")
+        self.events = self.ctx.Queue()
+        self.stop_event = self.ctx.Event()
+        self.processes = [None] * count
+        self._stopping = False
+        self._handlers = None
+
+    def _start(self, shard: int):
+        proc = self.ctx.Process(
+            target=worker_main,
+            args=(shard, self.shards[shard], len(self.shards), self.events, self.stop_event),
+            name=f"tracker-{shard}",
+            daemon=True,
+        )
+        proc.start()
+        self.processes[shard] = proc
+
+    async def run(self, post_embed, record_samples):
+        """Starts the workers and relays their events until stop() is called."""
+        self._handlers = (post_embed, record_samples)
+        limit_api(COORDINATOR_API_SHARE)
+        for shard in range(len(self.shards)):
+            self._start(shard)
+        print(f"🟢 Started {len(self.shards)} tracker worker process(es).")
+
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            try:
+                event = await loop.run_in_executor(None, self.events.get, True, SUPERVISE_SECONDS)
+            except queue.Empty:
+                event = None
+
+            if event is not None:
+                await self._handle(event)
+
+            for shard, proc in enumerate(self.processes):
+                if not self._stopping and not proc.is_alive():
+                    print(f"⚠️ Tracker worker {shard} exited ({proc.exitcode}), restarting.")
+                    self._start(shard)
+
+    async def _handle(self, event):
+        post_embed, record_samples = self._handlers
+        try:
+            if event[0] == "embed":
+                await post_embed(event[1], discord.Embed.from_dict(event[2]))
+            elif event[0] == "history":
+                record_samples(*event[1:])
+        except Exception as e:
+            print(f"⚠️ Could not handle worker event {event[0]}: {e}")
+
+    async def stop(self, timeout: float = 10):
+        """Asks the workers to flush and exit; terminates stragglers after `timeout`."""
+        self._stopping = True
+        self.stop_event.set()
+        # Keep draining while they exit: a worker blocks on exit until its
+        # queued events have been read
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while any(p and p.is_alive() for p in self.processes) and loop.time() < deadline:
+            await self._drain()
+            await asyncio.sleep(0.1)
+        for proc in self.processes:
+            if proc and proc.is_alive():
+                proc.terminate()
+        await self._drain()
+
+    async def _drain(self):
+        while self._handlers:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                return
+            await self._handle(event)